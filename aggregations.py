@@ -0,0 +1,72 @@
+"""Pre-aggregated chart data for the distribution and category charts.
+
+Plotly express embeds every row it is given in the figure JSON. Binning
+with ``np.histogram`` and counting categories with ``bincount`` server-side
+means the browser only receives one bar per bin and one slice per category,
+whatever the customer count. Results are cached per filter state.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+HISTOGRAM_BINS = 20
+
+
+def histogram(values, bins=HISTOGRAM_BINS, log=False):
+    """``(counts, edges)`` of ``values``; ``log`` uses geometric bin edges.
+
+    Log-scaled bins only cover positive values; zeros and negatives are left
+    out of the counts.
+    """
+    values = values[~np.isnan(values)]
+    if log:
+        values = values[values > 0]
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(1)
+    lo, hi = values.min(), values.max()
+    if log and hi > lo:
+        edges = np.geomspace(lo, hi, bins + 1)
+    else:
+        edges = np.histogram_bin_edges(values, bins)
+    counts, edges = np.histogram(values, edges)
+    return counts, edges
+
+
+def histogram_frame(counts, edges):
+    """Histogram bars as a DataFrame: left edge, width, count and a range label."""
+    return pd.DataFrame({
+        'start': edges[:-1],
+        'width': np.diff(edges),
+        'count': counts,
+        'range': [f"{lo:,.2f} - {hi:,.2f}" for lo, hi in zip(edges[:-1], edges[1:])],
+    })
+
+
+class Aggregator:
+    def __init__(self, df, numeric_columns=('Recency', 'Frequency', 'Monetary'),
+                 categorical_columns=('Category',), cache_size=128, cache=None):
+        self._values = {col: df[col].to_numpy(dtype=np.float64) for col in numeric_columns if col in df.columns}
+        self._codes = {}
+        for col in categorical_columns:
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col], sort=True)
+                self._codes[col] = (codes, list(uniques))
+        self._cache = LRUCache(cache_size) if cache is None else cache
+
+    def histogram(self, state_key, positions, col, bins=HISTOGRAM_BINS, log=False):
+        """Binned ``col`` over the filtered rows, as :func:`histogram_frame`."""
+        key = (state_key, 'histogram', col, bins, log)
+        return self._cache.get_or_compute(
+            key, lambda: histogram_frame(*histogram(self._values[col][positions], bins, log)))
+
+    def category_counts(self, state_key, positions, col):
+        """``col`` value counts over the filtered rows (non-empty categories only)."""
+        return self._cache.get_or_compute((state_key, 'counts', col), self._category_counts, positions, col)
+
+    def _category_counts(self, positions, col):
+        codes, uniques = self._codes[col]
+        codes = codes[positions]
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        present = counts > 0
+        return pd.DataFrame({col: np.asarray(uniques, dtype=object)[present], 'count': counts[present]})
@@ -2,7 +2,15 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import io
+from concurrent.futures import ThreadPoolExecutor
+
+import cluster_model
+import columnar
+import exports
+import stages
+from profiling import Profiler
+from shared import SharedDataset
+from table_view import PAGE_SIZES, page_count
 
 # --- Modern Header & CSS with Branding ---
 st.set_page_config(page_title="Customer Segmentation Dashboard by Nisha Nayani", layout="wide")
@@ -125,68 +133,76 @@ st.markdown(
 )
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
-# --- Load Data ---
-@st.cache_data
-def load_data():
-    rfm = pd.read_csv("RFM_Table.csv")
-    rfm_clustered = pd.read_csv("RFM_Clustered.csv")
-    return rfm, rfm_clustered
-rfm, rfm_clustered = load_data()
-
-# --- Customer Category Assignment (Simple, Clear) ---
-def qcut_with_dynamic_labels(series, q, label_order):
-    quantiles, bins = pd.qcut(series, q, retbins=True, duplicates='drop')
-    n_bins = len(bins) - 1
-    if n_bins < 2:
-        # Not enough unique values to bin, assign all to the first label
-        return pd.Series([label_order[0]] * len(series), index=series.index)
-    labels = label_order[:n_bins]
-    try:
-        return pd.qcut(series, q=n_bins, labels=labels, duplicates='drop')
-    except ValueError:
-        return pd.Series([label_order[0]] * len(series), index=series.index)
-
-rfm_clustered['R_rank'] = qcut_with_dynamic_labels(rfm_clustered['Recency'], 4, [4,3,2,1])
-rfm_clustered['F_rank'] = qcut_with_dynamic_labels(rfm_clustered['Frequency'], 4, [1,2,3,4])
-rfm_clustered['M_rank'] = qcut_with_dynamic_labels(rfm_clustered['Monetary'], 4, [1,2,3,4])
-def customer_category(row):
-    if row['R_rank'] == 4 and row['F_rank'] == 4 and row['M_rank'] == 4:
-        return 'High Value', 'Recent, frequent, and high spenders'
-    elif row['R_rank'] >= 3 and row['F_rank'] >= 3:
-        return 'Active', 'Recent and frequent, moderate spend'
-    elif row['R_rank'] <= 2 and (row['F_rank'] >= 3 or row['M_rank'] >= 3):
-        return 'At Risk', 'Used to spend, but not recent'
-    else:
-        return 'Inactive', 'Not recent, low spend/frequency'
-rfm_clustered[['Category', 'Category_Desc']] = rfm_clustered.apply(lambda row: pd.Series(customer_category(row)), axis=1)
+# --- Profiling ---
+# Times the stages of this rerun (see stages.py); shown at the bottom of the sidebar.
+show_profiling = st.sidebar.toggle('Show profiling panel', value=False, help="Wall time and memory per stage of the current rerun. Memory tracing slows the rerun down while this is on.")
+profiler = Profiler(enabled=show_profiling, memory=show_profiling)
+
+# --- Load Data & Customer Category Assignment ---
+# One dataset per data version, shared by reference with every session: the
+# memory-mapped table (CSV fallback) with its segments, the filter/Top N/
+# chart/table indexes and a memo cache of everything derived per filter state.
+@st.cache_resource(max_entries=1)
+def load_dataset(data_version, _profiler):
+    return SharedDataset.load(profiler=_profiler)
+with profiler.stage('dataset'):
+    data_version = columnar.data_version()
+    dataset = load_dataset(data_version, profiler)
+rfm_clustered, lookup_index, filter_index = dataset.df, dataset.lookup_index, dataset.filter_index
 
 # --- Advanced Sidebar Filters ---
+# Optional: Dropdown for categorical column (e.g., Country)
+categorical_cols = dataset.categorical_cols
+
 st.sidebar.header('Advanced Filters')
-min_r, max_r = int(rfm_clustered['Recency'].min()), int(rfm_clustered['Recency'].max())
-min_f, max_f = int(rfm_clustered['Frequency'].min()), int(rfm_clustered['Frequency'].max())
-min_m, max_m = float(rfm_clustered['Monetary'].min()), float(rfm_clustered['Monetary'].max())
+min_r, max_r = (int(v) for v in filter_index.bounds('Recency'))
+min_f, max_f = (int(v) for v in filter_index.bounds('Frequency'))
+# Monetary is stored as float32; round the bounds outward to cents for the slider.
+lo_m, hi_m = filter_index.bounds('Monetary')
+min_m, max_m = float(np.floor(float(lo_m) * 100) / 100), float(np.ceil(float(hi_m) * 100) / 100)
 recency_range = st.sidebar.slider('Recency Range', min_r, max_r, (min_r, max_r))
 frequency_range = st.sidebar.slider('Frequency Range', min_f, max_f, (min_f, max_f))
 monetary_range = st.sidebar.slider('Monetary Range', min_m, max_m, (min_m, max_m))
 
-# Optional: Dropdown for categorical column (e.g., Country)
-categorical_cols = [col for col in rfm_clustered.columns if rfm_clustered[col].dtype == 'object' and col != 'CustomerID']
 cat_filter = None
 cat_value = None
 if categorical_cols:
     cat_filter = st.sidebar.selectbox('Filter by', ['None'] + categorical_cols)
     if cat_filter != 'None':
-        cat_options = sorted(rfm_clustered[cat_filter].dropna().unique())
+        cat_options = filter_index.options(cat_filter)
         cat_value = st.sidebar.selectbox(f'Select {cat_filter}', ['All'] + cat_options)
 
-# Apply filters to filtered_df
-filtered_df = rfm_clustered[
-    (rfm_clustered['Recency'] >= recency_range[0]) & (rfm_clustered['Recency'] <= recency_range[1]) &
-    (rfm_clustered['Frequency'] >= frequency_range[0]) & (rfm_clustered['Frequency'] <= frequency_range[1]) &
-    (rfm_clustered['Monetary'] >= monetary_range[0]) & (rfm_clustered['Monetary'] <= monetary_range[1])
-]
+# Apply filters (row positions; no filtered copy of the table)
+filter_ranges = {'Recency': recency_range, 'Frequency': frequency_range, 'Monetary': monetary_range}
+filter_equals = {}
 if cat_filter and cat_filter != 'None' and cat_value and cat_value != 'All':
-    filtered_df = filtered_df[filtered_df[cat_filter] == cat_value]
+    filter_equals[cat_filter] = cat_value
+with profiler.stage('filter'):
+    filtered_pos, filter_state = dataset.filtered(filter_ranges, filter_equals)
+
+# --- Downloads (built on request, in the background, cached per filter state) ---
+export_manager = dataset.exports
+# Build times of the downloads shown this rerun, for the profiling panel (builds run outside the profiler).
+export_builds = {}
+
+@st.fragment(run_every=1)
+def wait_for_export(key):
+    if export_manager.status(key) != 'pending':
+        st.rerun()
+    st.caption("Preparing download...")
+
+def lazy_download_button(label, key, build, args, file_name, mime):
+    status = export_manager.status(key)
+    if status is None and st.button(label.replace("Download", "Prepare", 1), key=f"prepare_{file_name}"):
+        export_manager.submit(key, build, *args)
+        status = export_manager.status(key)
+    if status == 'pending':
+        wait_for_export(key)
+    elif status == 'ready':
+        st.download_button(label, data=export_manager.get(key), file_name=file_name, mime=mime)
+        export_builds[file_name] = export_manager.build_seconds(key)
+    elif status == 'failed':
+        st.warning(f"Could not prepare {file_name}: {export_manager.error(key)}")
 
 # --- Customer Lookup (with Personalized Recommendation) ---
 st.markdown('<div class="section-title fade-in">Customer Lookup (Full Details)</div>', unsafe_allow_html=True)
@@ -202,22 +218,26 @@ if not lookup_id.strip():
     st.info("Type a CustomerID above to see all available information for that customer.")
     # Show a sample table
     st.markdown('<div class="card-table">', unsafe_allow_html=True)
-    st.dataframe(filtered_df.head(5), use_container_width=True)
+    st.dataframe(dataset.rows(filtered_pos[:5]), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 else:
-    matches = filtered_df[filtered_df['CustomerID'].astype(str).str.contains(lookup_id.strip())]
+    # Look the ID up in the whole table first, then keep only the filtered rows.
+    with profiler.stage('lookup'):
+        matches = stages.lookup(lookup_index, rfm_clustered, lookup_id, filtered_pos)
     if not matches.empty:
         st.markdown('<div class="card-table">', unsafe_allow_html=True)
         st.dataframe(matches, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         # Personalized recommendation based on RFM
+        with profiler.stage('lookup'):
+            rec_q, freq_q, mon_q75 = dataset.recommendation_quantiles(filter_state, filtered_pos)
         for _, row in matches.iterrows():
             rec, freq, mon = row['Recency'], row['Frequency'], row['Monetary']
-            if rec <= filtered_df['Recency'].quantile(0.25) and freq >= filtered_df['Frequency'].quantile(0.75) and mon >= filtered_df['Monetary'].quantile(0.75):
+            if rec <= rec_q[0] and freq >= freq_q[1] and mon >= mon_q75:
                 st.success('Recommendation: Reward this loyal, high-value customer with a special offer!')
-            elif rec > filtered_df['Recency'].quantile(0.75):
+            elif rec > rec_q[1]:
                 st.warning('Recommendation: Win back this inactive customer with a re-engagement campaign.')
-            elif freq < filtered_df['Frequency'].quantile(0.25):
+            elif freq < freq_q[0]:
                 st.info('Recommendation: Encourage this customer to purchase more frequently.')
             else:
                 st.info('Recommendation: Keep this customer engaged with regular updates.')
@@ -227,16 +247,23 @@ else:
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
 # --- KPIs ---
+with profiler.stage('kpis'):
+    n_customers, avg_spend = dataset.kpis(filter_state, filtered_pos)
 kpi1, kpi2 = st.columns(2)
-kpi1.markdown(f'<div class="kpi-card"><span style="font-size:2rem;">👥</span><div class="kpi-value">{filtered_df["CustomerID"].nunique():,}</div><div class="kpi-label">Total Customers</div></div>', unsafe_allow_html=True)
-kpi2.markdown(f'<div class="kpi-card"><span style="font-size:2rem;">💰</span><div class="kpi-value">{filtered_df["Monetary"].mean():,.2f}</div><div class="kpi-label">Average Spend</div></div>', unsafe_allow_html=True)
+kpi1.markdown(f'<div class="kpi-card"><span style="font-size:2rem;">👥</span><div class="kpi-value">{n_customers:,}</div><div class="kpi-label">Total Customers</div></div>', unsafe_allow_html=True)
+kpi2.markdown(f'<div class="kpi-card"><span style="font-size:2rem;">💰</span><div class="kpi-value">{avg_spend:,.2f}</div><div class="kpi-label">Average Spend</div></div>', unsafe_allow_html=True)
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
+# Charts get pre-binned counts instead of one row per customer.
+aggregator = dataset.aggregator
+
 # --- Customer Category Proportions Pie Chart ---
-if 'Category' in rfm_clustered.columns and not filtered_df.empty:
+if 'Category' in rfm_clustered.columns and len(filtered_pos):
     st.markdown('<div class="section-title fade-in">Customer Category Proportions</div>', unsafe_allow_html=True)
     import plotly.express as px
-    pie_fig = px.pie(filtered_df, names='Category', title='Customer Category Proportions', color_discrete_sequence=px.colors.qualitative.Pastel)
+    with profiler.stage('aggregate'):
+        category_counts = aggregator.category_counts(filter_state, filtered_pos, 'Category')
+    pie_fig = px.pie(category_counts, names='Category', values='count', title='Customer Category Proportions', color_discrete_sequence=px.colors.qualitative.Pastel)
     st.plotly_chart(pie_fig, use_container_width=True)
     st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
@@ -244,20 +271,22 @@ if 'Category' in rfm_clustered.columns and not filtered_df.empty:
 st.markdown('<div class="section-title fade-in">Top N Customers</div>', unsafe_allow_html=True)
 st.caption("Explore your top customers by Recency (most recent), Frequency, or Monetary value. Use the tabs to switch views. Download each Top N list as CSV. Hover over bars for details.")
 top_n = st.slider("Select N (Top Customers)", 1, 50, 10)
+# All three rankings come from one cached computation per filter state.
+with profiler.stage('top-n'):
+    top_rankings = dataset.top_n.rankings(filter_state, filtered_pos, top_n)
 tabs = st.tabs(["Most Recent", "Most Frequent", "Top Monetary"])
 
 # Most Recent
 with tabs[0]:
     st.markdown('<div class="card-table">', unsafe_allow_html=True)
     st.caption("Most Recent Customers (Lowest Recency)")
-    if not filtered_df.empty:
-        top_recent = filtered_df.nsmallest(min(top_n, len(filtered_df)), 'Recency')[['CustomerID', 'Recency', 'Frequency', 'Monetary']]
+    if len(filtered_pos):
+        top_recent = top_rankings['recent']
         st.dataframe(top_recent, use_container_width=True)
         bar_fig = px.bar(top_recent[::-1], x='Recency', y='CustomerID', orientation='h', title="Top N Most Recent Customers", color='Recency', color_continuous_scale=px.colors.sequential.Blues)
         bar_fig.update_traces(marker_line_width=2)
         st.plotly_chart(bar_fig, use_container_width=True)
-        csv = top_recent.to_csv(index=False).encode('utf-8')
-        st.download_button("Download Top N Most Recent as CSV", data=csv, file_name="top_n_recent.csv", mime="text/csv")
+        lazy_download_button("Download Top N Most Recent as CSV", ('top_n_recent.csv', filter_state, top_n), exports.csv_bytes, (top_recent,), "top_n_recent.csv", "text/csv")
     else:
         st.info("No customers to display.")
     st.markdown('</div>', unsafe_allow_html=True)
@@ -266,14 +295,13 @@ with tabs[0]:
 with tabs[1]:
     st.markdown('<div class="card-table">', unsafe_allow_html=True)
     st.caption("Most Frequent Customers")
-    if not filtered_df.empty:
-        top_freq = filtered_df.nlargest(min(top_n, len(filtered_df)), 'Frequency')[['CustomerID', 'Recency', 'Frequency', 'Monetary']]
+    if len(filtered_pos):
+        top_freq = top_rankings['frequent']
         st.dataframe(top_freq, use_container_width=True)
         bar_fig = px.bar(top_freq[::-1], x='Frequency', y='CustomerID', orientation='h', title="Top N Most Frequent Customers", color='Frequency', color_continuous_scale=px.colors.sequential.Greens)
         bar_fig.update_traces(marker_line_width=2)
         st.plotly_chart(bar_fig, use_container_width=True)
-        csv = top_freq.to_csv(index=False).encode('utf-8')
-        st.download_button("Download Top N Most Frequent as CSV", data=csv, file_name="top_n_frequent.csv", mime="text/csv")
+        lazy_download_button("Download Top N Most Frequent as CSV", ('top_n_frequent.csv', filter_state, top_n), exports.csv_bytes, (top_freq,), "top_n_frequent.csv", "text/csv")
     else:
         st.info("No customers to display.")
     st.markdown('</div>', unsafe_allow_html=True)
@@ -282,94 +310,114 @@ with tabs[1]:
 with tabs[2]:
     st.markdown('<div class="card-table">', unsafe_allow_html=True)
     st.caption("Top Monetary Customers")
-    if not filtered_df.empty:
-        top_monetary = filtered_df.nlargest(min(top_n, len(filtered_df)), 'Monetary')[['CustomerID', 'Recency', 'Frequency', 'Monetary']]
+    if len(filtered_pos):
+        top_monetary = top_rankings['monetary']
         st.dataframe(top_monetary, use_container_width=True)
         bar_fig = px.bar(top_monetary[::-1], x='Monetary', y='CustomerID', orientation='h', title="Top N Monetary Customers", color='Monetary', color_continuous_scale=px.colors.sequential.Purples)
         bar_fig.update_traces(marker_line_width=2)
         st.plotly_chart(bar_fig, use_container_width=True)
-        csv = top_monetary.to_csv(index=False).encode('utf-8')
-        st.download_button("Download Top N Monetary as CSV", data=csv, file_name="top_n_monetary.csv", mime="text/csv")
+        lazy_download_button("Download Top N Monetary as CSV", ('top_n_monetary.csv', filter_state, top_n), exports.csv_bytes, (top_monetary,), "top_n_monetary.csv", "text/csv")
     else:
         st.info("No customers to display.")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Download all Top N as Excel
-import xlsxwriter
-import tempfile
-import os
-if not filtered_df.empty:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        with pd.ExcelWriter(tmp.name, engine='xlsxwriter') as writer:
-            top_recent.to_excel(writer, index=False, sheet_name='Most Recent')
-            top_freq.to_excel(writer, index=False, sheet_name='Most Frequent')
-            top_monetary.to_excel(writer, index=False, sheet_name='Top Monetary')
-        tmp.seek(0)
-        st.download_button("Download All Top N as Excel", data=tmp.read(), file_name="top_n_customers.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    os.unlink(tmp.name)
+if len(filtered_pos):
+    top_sheets = {'Most Recent': top_recent, 'Most Frequent': top_freq, 'Top Monetary': top_monetary}
+    lazy_download_button("Download All Top N as Excel", ('top_n_customers.xlsx', filter_state, top_n), exports.excel_bytes, (top_sheets,), "top_n_customers.xlsx", exports.XLSX_MIME)
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
 # --- RFM Distributions (Interactive) ---
 st.markdown('<div class="section-title fade-in">RFM Distributions</div>', unsafe_allow_html=True)
 st.caption("Select an RFM variable to view its distribution. All charts are interactive: zoom, pan, hover, and select.")
 rfm_var = st.selectbox("Choose RFM variable", ["Recency", "Frequency", "Monetary"])
-hist_fig = px.histogram(filtered_df, x=rfm_var, nbins=20, title=f"{rfm_var} Distribution", color_discrete_sequence=px.colors.qualitative.Pastel)
+log_bins = st.checkbox("Log-scaled bins (useful for the skewed Monetary values)", value=False)
+with profiler.stage('aggregate'):
+    hist_bins = aggregator.histogram(filter_state, filtered_pos, rfm_var, log=log_bins)
+hist_fig = stages.histogram_figure(hist_bins, rfm_var, log_bins)
 st.plotly_chart(hist_fig, use_container_width=True)
 # Download chart as PNG
-try:
-    png_bytes = hist_fig.to_image(format="png")
-    st.download_button(f"Download {rfm_var} Histogram as PNG", data=png_bytes, file_name=f"{rfm_var.lower()}_histogram.png", mime="image/png")
-except Exception as e:
+png_key = (f"{rfm_var.lower()}_histogram.png", filter_state, log_bins)
+if export_manager.status(png_key) == 'failed':
     st.info("Install the 'kaleido' package to enable chart image export: pip install -U kaleido")
+else:
+    lazy_download_button(f"Download {rfm_var} Histogram as PNG", png_key, hist_fig.to_image, ("png",), f"{rfm_var.lower()}_histogram.png", "image/png")
+st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+
+# --- Cluster Model Selection (runs in the background) ---
+st.markdown('<div class="section-title fade-in">Cluster Model Selection</div>', unsafe_allow_html=True)
+st.caption("Fit KMeans for k = 1 to 10 on all customers in the background, compare the elbow curve and silhouette scores, and save the k you choose as the cluster model.")
+
+@st.cache_resource
+def get_background_executor():
+    return ThreadPoolExecutor(max_workers=1)
+
+def run_model_selection(rfm_clustered):
+    # Imported here: scikit-learn would add about a second to every cold start.
+    import model_selection
+    X, scaler = model_selection.scale_features(rfm_clustered)
+    return scaler, model_selection.select_k(X)
+
+@st.fragment(run_every=2)
+def poll_model_selection():
+    if st.session_state['model_selection'].done():
+        st.rerun()
+    st.info("Fitting KMeans for k = 1 to 10 in the background. You can keep using the dashboard.")
+
+if st.button("Run Model Selection"):
+    st.session_state['model_selection'] = get_background_executor().submit(run_model_selection, rfm_clustered)
+selection_future = st.session_state.get('model_selection')
+if selection_future is None:
+    st.info("Click 'Run Model Selection' to compute the elbow curve.")
+elif not selection_future.done():
+    poll_model_selection()
+elif selection_future.exception() is not None:
+    # Forget the failed run so the rest of the page keeps rendering; the button can start a new one.
+    del st.session_state['model_selection']
+    st.error(f"Model selection failed: {selection_future.exception()}")
+else:
+    import model_selection
+    scaler, selection_results = selection_future.result()
+    selection_table = model_selection.summary(selection_results)
+    elbow_fig = px.line(selection_table, x='k', y='inertia', markers=True, title="Elbow Method for Optimal k")
+    st.plotly_chart(elbow_fig, use_container_width=True)
+    st.dataframe(selection_table, use_container_width=True)
+    k_options = selection_table['k'].tolist()
+    chosen_k = st.selectbox("k to save", k_options, index=k_options.index(model_selection.elbow_k(selection_results)))
+    if st.button("Save Cluster Model"):
+        chosen = next(r for r in selection_results if r['k'] == chosen_k)
+        model = cluster_model.save_model(scaler, chosen['centroids'])
+        cluster_model.save_labels(model)
+        st.success(f"Saved the k={chosen_k} model to {cluster_model.MODEL_PATH} and relabelled all {len(rfm_clustered):,} customers with it. The new clusters show from the next interaction.")
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
 # --- Data Table & Export ---
 st.markdown('<div class="section-title fade-in">Customer Data Table & Export</div>', unsafe_allow_html=True)
 st.caption("Outliers in Recency, Frequency, and Monetary are highlighted. Download as CSV or Excel.")
-outlier_flags = pd.DataFrame(index=filtered_df.index)
-for col in ['Recency', 'Frequency', 'Monetary']:
-    q_low = filtered_df[col].quantile(0.01)
-    q_high = filtered_df[col].quantile(0.99)
-    outlier_flags[col+'_outlier'] = (filtered_df[col] <= q_low) | (filtered_df[col] >= q_high)
-filtered_reset = filtered_df.reset_index(drop=True)
-outlier_flags_reset = outlier_flags.reset_index(drop=True)
-if not filtered_reset.empty and all(col in filtered_reset.columns for col in ['Recency', 'Frequency', 'Monetary']):
-    styled_table = filtered_reset.style
-    if 'Recency' in filtered_reset.columns and 'Recency_outlier' in outlier_flags_reset.columns:
-        styled_table = styled_table.apply(
-            lambda x: [
-                'background-color: #ffe0e0' if outlier_flags_reset['Recency_outlier'].iloc[i] else ''
-                for i, _ in enumerate(x)
-            ], subset=['Recency'])
-    if 'Frequency' in filtered_reset.columns and 'Frequency_outlier' in outlier_flags_reset.columns:
-        styled_table = styled_table.apply(
-            lambda x: [
-                'background-color: #e0ffe0' if outlier_flags_reset['Frequency_outlier'].iloc[i] else ''
-                for i, _ in enumerate(x)
-            ], subset=['Frequency'])
-    if 'Monetary' in filtered_reset.columns and 'Monetary_outlier' in outlier_flags_reset.columns:
-        styled_table = styled_table.apply(
-            lambda x: [
-                'background-color: #e0e0ff' if outlier_flags_reset['Monetary_outlier'].iloc[i] else ''
-                for i, _ in enumerate(x)
-            ], subset=['Monetary'])
-    st.markdown('<div class="card-table">', unsafe_allow_html=True)
-    st.dataframe(styled_table, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-else:
-    st.markdown('<div class="card-table">', unsafe_allow_html=True)
-    st.dataframe(filtered_reset, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+table_view = dataset.table_view
+
+# Only the visible page is styled and sent to the browser.
+page_col1, page_col2, page_col3 = st.columns([1, 1, 2])
+with page_col1:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+with page_col2:
+    n_pages = page_count(len(filtered_pos), page_size)
+    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+with page_col3:
+    first_row = min((page - 1) * page_size + 1, len(filtered_pos))
+    last_row = min(page * page_size, len(filtered_pos))
+    st.caption(f"Showing rows {first_row:,}-{last_row:,} of {len(filtered_pos):,} (page {page} of {n_pages:,})")
+st.markdown('<div class="card-table">', unsafe_allow_html=True)
+with profiler.stage('table'):
+    st.dataframe(table_view.styled_page(filter_state, filtered_pos, page, page_size), use_container_width=True)
+st.markdown('</div>', unsafe_allow_html=True)
 
 # CSV download
-csv = filtered_df.to_csv(index=False).encode('utf-8')
-st.download_button("Download as CSV", data=csv, file_name="customers.csv", mime="text/csv")
+# The filtered rows are taken on the export thread, only when a download is prepared.
+lazy_download_button("Download as CSV", ('customers.csv', filter_state), lambda positions: exports.csv_bytes(dataset.rows(positions)), (filtered_pos,), "customers.csv", "text/csv")
 
 # Excel download
-excel_buffer = io.BytesIO()
-with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-    filtered_df.to_excel(writer, index=False, sheet_name='Customers')
-st.download_button("Download Filtered Data as Excel", data=excel_buffer.getvalue(), file_name="customers.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+lazy_download_button("Download Filtered Data as Excel", ('customers.xlsx', filter_state), lambda positions: exports.excel_bytes({'Customers': dataset.rows(positions)}), (filtered_pos,), "customers.xlsx", exports.XLSX_MIME)
 
 # --- Help/About Section ---
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
@@ -388,4 +436,19 @@ st.info('''
 
 # --- Footer ---
 st.markdown('<div class="footer">Dashboard by Nisha Nayani</div>', unsafe_allow_html=True)
-st.markdown('<div class="footer-small">Made with Streamlit & Plotly</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<div class="footer-small">Made with Streamlit & Plotly</div>', unsafe_allow_html=True)
+
+# --- Profiling Panel ---
+if show_profiling:
+    profiler.close()
+    profile_table = profiler.table()
+    with st.sidebar.expander('Profiling (this rerun)', expanded=True):
+        st.caption(f"{profile_table.loc[~profile_table.index.str.contains('/'), 'seconds'].sum() * 1000:,.1f} ms in timed stages. Substages (stage/substage) only appear when their cached result had to be recomputed.")
+        st.dataframe(profile_table.style.format({'seconds': '{:.4f}', 'allocated_mb': '{:,.1f}', 'peak_mb': '{:,.1f}', 'share': '{:.0%}'}), use_container_width=True)
+        # Shared by all sessions, so these counts cover every user since the data was loaded.
+        memo_stats = dataset.memo.stats()
+        st.caption(f"Shared cache: {memo_stats['entries']:,} entries, {memo_stats['nbytes'] / 1024**2:,.1f} MB, {memo_stats['hits']:,} hits / {memo_stats['misses']:,} misses, {memo_stats['evictions']:,} evictions")
+        st.dataframe(pd.DataFrame.from_dict(memo_stats['namespaces'], orient='index', columns=['entries', 'nbytes', 'hits', 'misses']), use_container_width=True)
+        if export_builds:
+            st.caption("Ready downloads: background build time (not part of this rerun)")
+            st.dataframe(pd.DataFrame({'file': list(export_builds), 'build_seconds': list(export_builds.values())}).set_index('file').style.format({'build_seconds': '{:.4f}'}, na_rep='-'), use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""Benchmarks for the dashboard hot paths.
+
+Runs on synthetic RFM tables shaped like ``RFM_Clustered.csv``. The
+``segmentation`` suite compares the vectorized segmentation engine against
+the original row-wise ``apply`` implementation; the ``stages`` suite times
+every dashboard stage (see ``stages.py``) on a ``shared.SharedDataset``
+for a first load, a slider move and a second session on the same filters,
+and can save the figures as JSON to compare runs::
+
+    python benchmark.py --sizes 10000 100000 1000000
+    python benchmark.py --suite stages --sizes 10000 1000000 10000000 --json stages.json
+"""
+import argparse
+import json
+import platform
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import segmentation
+import stages
+from profiling import Profiler
+from shared import SharedDataset
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def synthetic_rfm(n_rows, seed=42):
+    """Random RFM table with the column layout and skew of RFM_Clustered.csv."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CustomerID': np.arange(12346, 12346 + n_rows, dtype=np.int64).astype(float),
+        'Recency': rng.integers(1, 375, n_rows),
+        'Frequency': np.minimum(rng.geometric(0.3, n_rows), 250),
+        'Monetary': np.round(rng.lognormal(6.5, 1.2, n_rows), 2),
+        'Cluster': rng.integers(0, 4, n_rows),
+    })
+
+
+# --- Original implementation from app.py, kept for comparison ---
+def legacy_qcut_with_dynamic_labels(series, q, label_order):
+    quantiles, bins = pd.qcut(series, q, retbins=True, duplicates='drop')
+    n_bins = len(bins) - 1
+    if n_bins < 2:
+        return pd.Series([label_order[0]] * len(series), index=series.index)
+    labels = label_order[:n_bins]
+    try:
+        return pd.qcut(series, q=n_bins, labels=labels, duplicates='drop')
+    except ValueError:
+        return pd.Series([label_order[0]] * len(series), index=series.index)
+
+
+def legacy_customer_category(row):
+    if row['R_rank'] == 4 and row['F_rank'] == 4 and row['M_rank'] == 4:
+        return 'High Value', 'Recent, frequent, and high spenders'
+    elif row['R_rank'] >= 3 and row['F_rank'] >= 3:
+        return 'Active', 'Recent and frequent, moderate spend'
+    elif row['R_rank'] <= 2 and (row['F_rank'] >= 3 or row['M_rank'] >= 3):
+        return 'At Risk', 'Used to spend, but not recent'
+    else:
+        return 'Inactive', 'Not recent, low spend/frequency'
+
+
+def legacy_segment(df):
+    df = df.copy()
+    df['R_rank'] = legacy_qcut_with_dynamic_labels(df['Recency'], 4, [4, 3, 2, 1])
+    df['F_rank'] = legacy_qcut_with_dynamic_labels(df['Frequency'], 4, [1, 2, 3, 4])
+    df['M_rank'] = legacy_qcut_with_dynamic_labels(df['Monetary'], 4, [1, 2, 3, 4])
+    df[['Category', 'Category_Desc']] = df.apply(lambda row: pd.Series(legacy_customer_category(row)), axis=1)
+    return df
+
+
+def vectorized_segment(df):
+    return segmentation.segment(
+        df['Recency'].to_numpy(), df['Frequency'].to_numpy(), df['Monetary'].to_numpy(), index=df.index)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_segmentation(sizes, legacy_limit):
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}  match")
+    for n_rows in sizes:
+        df = synthetic_rfm(n_rows)
+        fast, fast_time = _timed(vectorized_segment, df)
+        if n_rows > legacy_limit:
+            print(f"{n_rows:>10,} {'skipped':>12} {fast_time:>15.4f} {'-':>9}  -")
+            continue
+        slow, slow_time = _timed(legacy_segment, df)
+        match = all(
+            np.array_equal(np.asarray(slow[col], dtype=object), np.asarray(fast[col], dtype=object))
+            for col in fast.columns
+        )
+        print(f"{n_rows:>10,} {slow_time:>12.4f} {fast_time:>15.4f} {slow_time / fast_time:>8.1f}x  {match}")
+
+
+def profile_stages(n_rows, memory=False, export=True):
+    """Stage timings for one synthetic table, through a ``SharedDataset`` as the dashboard uses it.
+
+    Three reruns: the first load, a slider move (a new filter state) and a
+    second session on the same filters (served from the shared memo).
+    """
+    with tempfile.TemporaryDirectory() as store:
+        columnar.write_store(synthetic_rfm(n_rows), store)
+        first = Profiler(memory=memory)
+        with first.stage('dataset'):
+            dataset = SharedDataset.load(store, profiler=first)
+        query = stages.sample_query(dataset.df)
+        stages.rerun(dataset, first, query=query, export=export)
+        first.close()
+        ranges = stages.narrowed_ranges(dataset.filter_index)
+        runs = {'first_load': first}
+        for run in ('slider_move', 'same_filters'):
+            runs[run] = Profiler(memory=memory)
+            stages.rerun(dataset, runs[run], ranges=ranges, query=query, export=export)
+            runs[run].close()
+        memo = dataset.memo.stats()
+    return {'rows': n_rows, **{run: profiler.to_dict() for run, profiler in runs.items()},
+            'memo': {key: memo[key] for key in ('entries', 'nbytes', 'hits', 'misses', 'evictions')}}
+
+
+def bench_stages(sizes, memory=False, export=True, json_path=None):
+    results = []
+    for n_rows in sizes:
+        result = profile_stages(n_rows, memory, export)
+        results.append(result)
+        for run in ('first_load', 'slider_move', 'same_filters'):
+            print(f"\n{n_rows:,} rows, {run.replace('_', ' ')}")
+            print(f"{'stage':>20} {'seconds':>10}" + (f" {'alloc (MB)':>11} {'peak (MB)':>10}" if memory else ''))
+            for name, record in result[run].items():
+                line = f"{name:>20} {record['seconds']:>10.4f}"
+                if memory:
+                    line += f" {record['allocated_mb']:>11.1f} {record['peak_mb']:>10.1f}"
+                print(line)
+        memo = result['memo']
+        print(f"\nshared memo: {memo['entries']:,} entries, {memo['nbytes'] / 1024**2:,.1f} MB, "
+              f"{memo['hits']:,} hits / {memo['misses']:,} misses")
+    if json_path:
+        report = {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'memory_traced': memory,
+            'results': results,
+        }
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nStage timings written to '{json_path}'")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=['segmentation', 'stages'], default='segmentation')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--legacy-limit', type=int, default=1_000_000,
+                        help='skip the row-wise implementation above this many rows')
+    parser.add_argument('--memory', action='store_true',
+                        help='trace memory per stage with tracemalloc (slower)')
+    parser.add_argument('--no-export', action='store_true', help='skip the CSV/Excel/PNG export stage')
+    parser.add_argument('--json', help='write the stage timings to this file')
+    args = parser.parse_args()
+    if args.suite == 'stages':
+        bench_stages(args.sizes, args.memory, not args.no_export, args.json)
+    else:
+        bench_segmentation(args.sizes, args.legacy_limit)
+
+
+if __name__ == '__main__':
+    main()
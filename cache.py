@@ -0,0 +1,208 @@
+"""Small thread-safe memo caches shared by the dashboard components."""
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+_MISSING = object()
+
+
+def estimate_nbytes(value):
+    """Approximate memory held by a cached value (arrays, frames, bytes and containers of them)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping.
+
+    Bounded by entry count and, when ``max_bytes`` is given, by the total of
+    ``sizeof(value)`` over the entries (``len`` by default, which suits
+    bytes payloads). Safe to share between Streamlit sessions (they run on
+    separate threads). Counts hits, misses and evictions; see :meth:`stats`.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self._count(key, hit=False)
+                return default
+            self._count(key, hit=True)
+            self._data.move_to_end(key)
+            return value
+
+    def _count(self, key, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._sizes.pop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                old_key, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """Return the cached value for ``key``, computing it with ``func`` on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Entry count, bytes held, hits, misses, evictions and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'nbytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else float('nan'),
+        }
+
+
+class MemoCache(LRUCache):
+    """One byte-bounded memo for every derived result, shared by all sessions.
+
+    Components get a :meth:`namespace` view each, so their keys cannot
+    collide and hits/misses are also counted per namespace. Entries are sized
+    with :func:`estimate_nbytes` and the least recently used ones are evicted
+    once ``max_bytes`` is exceeded. Concurrent :meth:`get_or_compute` calls
+    for the same key compute it once; the other callers wait for that result.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=512 * 1024 * 1024, sizeof=estimate_nbytes):
+        super().__init__(maxsize, max_bytes, sizeof)
+        self._namespace_stats = {}
+        self._inflight = {}
+
+    def _count(self, key, hit):
+        super()._count(key, hit)
+        if isinstance(key, tuple) and key and key[0] in self._namespace_stats:
+            self._namespace_stats[key[0]]['hits' if hit else 'misses'] += 1
+
+    def _miss_was_hit(self, key):
+        # Served by another caller's computation: count it as a hit after all.
+        self.misses -= 1
+        self._count(key, hit=True)
+        if isinstance(key, tuple) and key and key[0] in self._namespace_stats:
+            self._namespace_stats[key[0]]['misses'] -= 1
+
+    def namespace(self, name):
+        """A view of this cache whose keys are prefixed with ``name``."""
+        with self._lock:
+            self._namespace_stats.setdefault(name, {'hits': 0, 'misses': 0})
+        return CacheNamespace(self, name)
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if not owner:
+                self._miss_was_hit(key)
+            elif key in self._data:
+                # Computed by another session since the lookup above.
+                self._miss_was_hit(key)
+                return self._data[key]
+            else:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        """:meth:`LRUCache.stats` plus ``{'namespaces': {name: {entries, nbytes, hits, misses}}}``."""
+        stats = super().stats()
+        with self._lock:
+            namespaces = {name: dict(counts, entries=0, nbytes=0) for name, counts in self._namespace_stats.items()}
+            for key, size in self._sizes.items():
+                if isinstance(key, tuple) and key and key[0] in namespaces:
+                    namespaces[key[0]]['entries'] += 1
+                    namespaces[key[0]]['nbytes'] += size
+        stats['namespaces'] = namespaces
+        return stats
+
+
+class CacheNamespace:
+    """Key-prefixing view of a :class:`MemoCache`; usable wherever an ``LRUCache`` is."""
+
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+
+    def __contains__(self, key):
+        return (self.name, key) in self.cache
+
+    def get(self, key, default=None):
+        return self.cache.get((self.name, key), default)
+
+    def put(self, key, value):
+        self.cache.put((self.name, key), value)
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        return self.cache.get_or_compute((self.name, key), func, *args, **kwargs)
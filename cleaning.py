@@ -0,0 +1,191 @@
+"""Typed, parallel cleaning of the raw e-commerce transaction dump.
+
+Module equivalent of ``data_cleaning(Customer_Segmentation).ipynb`` (the
+same rules: drop rows without a CustomerID, with a non-positive Quantity or
+UnitPrice, or with an unparseable InvoiceDate), with three differences:
+
+* columns are read with compact dtypes: categories for the repeated strings
+  (InvoiceNo, StockCode, Description, Country), int32 Quantity, float32
+  UnitPrice and an int32 CustomerID instead of ``17850.0`` floats;
+* the InvoiceDate format is detected once from the head of the file and
+  every distinct date string is parsed once, instead of ``format='mixed'``
+  guessing per row;
+* the file is split into byte ranges at line ends and the ranges are
+  cleaned across a process pool.
+
+The result is written as a columnar store (see ``columnar.py``) that loads
+as memory maps instead of being parsed again::
+
+    python cleaning.py "E-Commerce data.csv" -o cleaned_store
+
+Byte-range splitting assumes no quoted field spans a line break, which holds
+for this dump.
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import columnar
+from rfm_builder import DATE_FORMAT, ENCODING, write_table
+
+OUTPUT_DIR = 'cleaned_store'
+CHUNK_BYTES = 32 * 1024 * 1024
+READ_DTYPES = {
+    'InvoiceNo': 'category',
+    'StockCode': 'category',
+    'Description': 'category',
+    'Quantity': np.int32,
+    # Read as categories so each distinct timestamp string is parsed once.
+    'InvoiceDate': 'category',
+    'UnitPrice': np.float32,
+    'CustomerID': np.float64,
+    'Country': 'category',
+}
+SCHEMA = {'Quantity': np.int32, 'UnitPrice': np.float32, 'CustomerID': np.int32}
+DATE_FORMATS = [DATE_FORMAT, '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M']
+SNIFF_ROWS = 10_000
+
+
+def read_header(path, encoding=ENCODING):
+    """Column names and the byte offset where the data rows start."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        return next(csv.reader([header.decode(encoding)])), f.tell()
+
+
+def byte_ranges(path, chunk_bytes=CHUNK_BYTES, start=0):
+    """``(start, stop)`` offsets of roughly ``chunk_bytes`` each, ending on line breaks."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            stop = min(f.tell(), size)
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+
+def detect_date_format(values, formats=DATE_FORMATS):
+    """The one of ``formats`` that parses most distinct ``values`` (earliest on ties).
+
+    Falls back to ``'mixed'`` when none of them parses anything.
+    """
+    values = pd.Series(pd.unique(pd.Series(values).dropna()))
+    parsed = [pd.to_datetime(values, format=date_format, errors='coerce').notna().sum() for date_format in formats]
+    best = int(np.argmax(parsed))
+    return formats[best] if parsed[best] else 'mixed'
+
+
+def sniff_date_format(path, encoding=ENCODING, nrows=SNIFF_ROWS):
+    """Detect the InvoiceDate format from the first ``nrows`` rows of ``path``."""
+    head = pd.read_csv(path, usecols=['InvoiceDate'], dtype=str, nrows=nrows, encoding=encoding)
+    return detect_date_format(head['InvoiceDate'])
+
+
+def parse_dates(values, date_format=DATE_FORMAT):
+    """Parse a categorical of date strings by parsing only its categories.
+
+    Strings that do not match ``date_format`` become NaT.
+    """
+    values = pd.Categorical(values)
+    parsed = pd.to_datetime(values.categories, format=date_format, errors='coerce').to_numpy()
+    # Missing values have code -1: a trailing NaT makes that index valid even
+    # when there are no categories at all.
+    parsed = np.append(parsed, np.array('NaT', dtype=parsed.dtype))
+    return parsed[values.codes]
+
+
+def clean_chunk(chunk, date_format=DATE_FORMAT):
+    """Apply the notebook's cleaning rules to one typed chunk of raw transactions."""
+    chunk = chunk[chunk['CustomerID'].notna() & (chunk['Quantity'] > 0) & (chunk['UnitPrice'] > 0)]
+    dates = parse_dates(chunk['InvoiceDate'], date_format)
+    valid = ~np.isnat(dates)
+    chunk = chunk.assign(InvoiceDate=dates, CustomerID=chunk['CustomerID'].round().astype(np.int32))
+    return chunk[valid].reset_index(drop=True)
+
+
+def read_range(path, start, stop, names, encoding=ENCODING, date_format=DATE_FORMAT):
+    """Read and clean the rows between byte offsets ``start`` and ``stop``."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    dtypes = {col: dtype for col, dtype in READ_DTYPES.items() if col in names}
+    if not data:
+        # read_csv refuses empty input; an empty frame still needs the dtypes.
+        return clean_chunk(pd.DataFrame({col: pd.Series(dtype=dtypes.get(col, object)) for col in names}), date_format)
+    chunk = pd.read_csv(io.BytesIO(data), header=None, names=names, dtype=dtypes, encoding=encoding)
+    return clean_chunk(chunk, date_format)
+
+
+def combine(chunks):
+    """Concatenate cleaned chunks in order, merging their categories."""
+    columns = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            merged = union_categoricals([chunk[col].array for chunk in chunks], sort_categories=True)
+            columns[col] = merged.remove_unused_categories()
+        else:
+            columns[col] = np.concatenate([chunk[col].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
+
+
+def clean(path, chunk_bytes=CHUNK_BYTES, max_workers=None, encoding=ENCODING, date_format=None):
+    """Cleaned transactions of ``path``, in file order.
+
+    ``date_format`` is detected from the head of the file when not given.
+    With a single worker (or a single chunk) the ranges are cleaned one after
+    another in this process, which skips the pool start-up cost.
+    """
+    names, data_start = read_header(path, encoding)
+    date_format = date_format or sniff_date_format(path, encoding)
+    ranges = byte_ranges(path, chunk_bytes, data_start) or [(data_start, data_start)]
+    args = [(path, start, stop, names, encoding, date_format) for start, stop in ranges]
+    if len(ranges) == 1 or (max_workers or os.cpu_count() or 1) == 1:
+        return combine([read_range(*range_args) for range_args in args])
+    # spawn, not fork, like model_selection: callers may have threads running.
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        chunks = list(pool.map(read_range, *zip(*args)))
+    return combine(chunks)
+
+
+def write_cleaned(df, path=OUTPUT_DIR):
+    """Write cleaned transactions as a columnar store, or as ``.csv``/``.parquet``."""
+    if str(path).endswith(('.csv', '.parquet')):
+        write_table(df, path)
+    else:
+        columnar.write_store(df, path, schema=SCHEMA)
+
+
+def load_cleaned(path=OUTPUT_DIR):
+    """Cleaned transactions from a store written by :func:`write_cleaned`."""
+    return columnar.read_store(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean the raw transaction CSV into a compact columnar store.')
+    parser.add_argument('transactions', help='raw transaction CSV (E-Commerce data.csv layout)')
+    parser.add_argument('-o', '--output', default=OUTPUT_DIR,
+                        help='store directory, or a .csv/.parquet file')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024),
+                        help='size of the byte ranges cleaned per worker task')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--date-format', help='InvoiceDate format (default: detected)')
+    parser.add_argument('--encoding', default=ENCODING)
+    args = parser.parse_args()
+
+    df = clean(args.transactions, args.chunk_mb * 1024 * 1024, args.jobs, args.encoding, args.date_format)
+    write_cleaned(df, args.output)
+    print(f"{len(df):,} cleaned transactions saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Persisted scaler + centroid model and fast batch cluster assignment.
+
+The fitted ``StandardScaler`` statistics and KMeans centroids are stored in a
+small versioned JSON file, and :func:`assign_clusters` scores new customers
+with plain NumPy (no scikit-learn import), so cold-start scoring in the
+dashboard or a batch job costs milliseconds per million rows::
+
+    model = load_model()
+    labels = assign_clusters(recency, frequency, monetary, model)
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnar
+
+MODEL_PATH = 'cluster_model.json'
+FORMAT_VERSION = 1
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+CHUNK_SIZE = 1 << 16
+
+
+class ClusterModel:
+    """Standard-scaler statistics plus centroids in scaled space."""
+
+    def __init__(self, mean, scale, centroids, features=FEATURES):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        # Fold the scaling into the centroids: for x_s = (x - mean) / scale,
+        # |x_s - c|^2 = |x_s|^2 - 2 x.(c / scale) + (|c|^2 + 2 mean.(c / scale)),
+        # and |x_s|^2 does not change which centroid is nearest.
+        self._weights = (self.centroids / self.scale).T
+        self._offsets = (self.centroids ** 2).sum(axis=1) + 2 * self.mean @ self._weights
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    @classmethod
+    def from_labels(cls, X, labels):
+        """Rebuild a model from unscaled features and their KMeans labels.
+
+        A converged KMeans centroid is the mean of its members, so this
+        recovers the notebook's model from ``RFM_Clustered.csv`` alone.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+        scaled = (X - mean) / scale
+        labels = np.asarray(labels)
+        centroids = np.stack([scaled[labels == k].mean(axis=0) for k in range(labels.max() + 1)])
+        return cls(mean, scale, centroids)
+
+    def predict(self, X, chunk_size=CHUNK_SIZE):
+        """Nearest-centroid label for each row of unscaled features ``X``."""
+        X = np.asarray(X)
+        labels = np.empty(len(X), dtype=np.int8)
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size].astype(np.float64, copy=False)
+            labels[start:start + chunk_size] = (self._offsets - 2 * chunk @ self._weights).argmin(axis=1)
+        return labels
+
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'features': self.features,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'centroids': self.centroids.tolist(),
+        }
+
+    def save(self, path=MODEL_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def load_model(path=MODEL_PATH):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported cluster model version {data.get('version')} in {path}")
+    return ClusterModel(data['mean'], data['scale'], data['centroids'], data['features'])
+
+
+def assign_clusters(recency, frequency, monetary, model=None, chunk_size=CHUNK_SIZE):
+    """Cluster labels (int8) for R/F/M arrays; loads ``MODEL_PATH`` when no model is given."""
+    model = load_model() if model is None else model
+    X = np.column_stack([np.asarray(recency), np.asarray(frequency), np.asarray(monetary)])
+    return model.predict(X, chunk_size)
+
+
+def save_model(scaler, centroids, path=MODEL_PATH):
+    """Persist the chosen model: a fitted ``StandardScaler``'s statistics and its KMeans centroids."""
+    model = ClusterModel(scaler.mean_, scaler.scale_, centroids, FEATURES)
+    model.save(path)
+    return model
+
+
+def save_labels(model, rfm_df=None, csv=columnar.CSV_PATH, store=columnar.STORE_DIR):
+    """Relabel every customer with ``model`` and write the clustered table.
+
+    ``rfm_df`` defaults to the table in ``csv`` (read at full precision; the
+    store's compact dtypes would round Monetary), or the store when there is
+    no CSV. The result goes to ``csv`` and, when there is one, to the
+    columnar ``store``. Call it whenever a new model is saved: labels left
+    over from the previous model would be mixed with the new one by
+    ``rfm_state.py update``.
+    """
+    if rfm_df is None:
+        rfm_df = pd.read_csv(csv) if os.path.exists(csv) else columnar.read_store(store, mmap=False)
+    clustered = rfm_df.assign(Cluster=model.predict(rfm_df[FEATURES].to_numpy()))
+    clustered.to_csv(csv, index=False)
+    if columnar.has_store(store):
+        columnar.write_store(clustered, store)
+    return clustered
@@ -0,0 +1,158 @@
+"""Columnar, memory-mappable storage for the clustered RFM table.
+
+The store is a directory with one ``.npy`` file per column and a small
+``manifest.json``. Columns have fixed compact dtypes, and loading maps the
+files read-only instead of parsing text, so a cold start touches almost no
+memory and several dashboard processes share the same page-cache pages.
+Categorical columns are stored as their integer codes plus a
+``<column>.categories.npy`` file.
+
+Each write goes to a new version subdirectory, which the ``CURRENT`` file
+then names (swapped in with ``os.replace``). Files a running dashboard has
+mapped are never rewritten in place: readers keep the old version's inodes
+until they reload, and ``data_version`` changes with the swap.
+``RFM_Clustered.csv`` remains a fallback when no store has been written::
+
+    python columnar.py RFM_Clustered.csv -o rfm_store
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = 'rfm_store'
+CSV_PATH = 'RFM_Clustered.csv'
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+FORMAT_VERSION = 1
+SCHEMA = {
+    'CustomerID': np.int64,
+    'Recency': np.int32,
+    'Frequency': np.int32,
+    'Monetary': np.float32,
+    'Cluster': np.int8,
+}
+
+
+def to_schema(df, schema=SCHEMA):
+    """Cast the ``schema`` columns of ``df`` to their storage dtypes; categoricals are kept."""
+    columns = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            columns[col] = df[col].array
+            continue
+        values = df[col].to_numpy()
+        if col in schema:
+            if col == 'CustomerID':
+                values = np.round(values)
+            values = values.astype(schema[col])
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def write_store(df, path=STORE_DIR, schema=SCHEMA):
+    """Write ``df`` as a new version of the store at ``path`` and switch ``CURRENT`` to it."""
+    os.makedirs(path, exist_ok=True)
+    version = f'v{time.time_ns()}-{os.getpid()}'
+    staging = os.path.join(path, f'.{version}.tmp')
+    _write_version(df, staging, schema)
+    os.replace(staging, os.path.join(path, version))
+    pointer = os.path.join(path, f'.{CURRENT}.{version}.tmp')
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, CURRENT))
+    _remove_old_versions(path, version)
+
+
+def _remove_old_versions(path, current):
+    # Unlinking is safe for readers that still map the old files (POSIX keeps
+    # the inodes alive); where it is not allowed the old version just stays.
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if name.startswith('v') and os.path.isdir(full) and name < current:
+            shutil.rmtree(full, ignore_errors=True)
+
+
+def _write_version(df, path, schema):
+    os.makedirs(path)
+    df = to_schema(df, schema)
+    categorical = []
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            categorical.append(col)
+            categories = values.categories.to_numpy()
+            if categories.dtype == object:
+                # Fixed-width unicode, since .npy files are written without pickle.
+                categories = categories.astype(str)
+            np.save(os.path.join(path, f'{col}.categories.npy'), categories, allow_pickle=False)
+            values = values.codes
+        np.save(os.path.join(path, f'{col}.npy'), np.asarray(values), allow_pickle=False)
+    manifest = {'version': FORMAT_VERSION, 'rows': len(df), 'columns': list(df.columns), 'categorical': categorical}
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+
+def resolve_store(path=STORE_DIR):
+    """Directory holding the current version of the store at ``path``, or ``None``."""
+    try:
+        with open(os.path.join(path, CURRENT)) as f:
+            version_path = os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return version_path if os.path.exists(os.path.join(version_path, MANIFEST)) else None
+
+
+def read_store(path=STORE_DIR, mmap=True):
+    """Load a store as a DataFrame whose columns are read-only memory maps."""
+    version_path = resolve_store(path)
+    if version_path is None:
+        raise FileNotFoundError(f"No columnar store at {path}")
+    path = version_path
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest['version'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported store version {manifest['version']} in {path}")
+    mode = 'r' if mmap else None
+    columns = {col: np.load(os.path.join(path, f'{col}.npy'), mmap_mode=mode, allow_pickle=False)
+               for col in manifest['columns']}
+    for col in manifest.get('categorical', []):
+        categories = np.load(os.path.join(path, f'{col}.categories.npy'), allow_pickle=False)
+        columns[col] = pd.Categorical.from_codes(columns[col], categories=categories, validate=False)
+    return pd.DataFrame(columns, copy=False)
+
+
+def has_store(path=STORE_DIR):
+    return resolve_store(path) is not None
+
+
+def data_version(store=STORE_DIR, csv=CSV_PATH):
+    """Identifies the data ``load_rfm`` will read, for cache keys; changes with every store write."""
+    version_path = resolve_store(store)
+    source = os.path.join(version_path, MANIFEST) if version_path else csv
+    return source, os.path.getmtime(source)
+
+
+def load_rfm(store=STORE_DIR, csv=CSV_PATH):
+    """Clustered RFM table from the columnar store, or from the CSV if there is none."""
+    if has_store(store):
+        return read_store(store)
+    return to_schema(pd.read_csv(csv))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert an RFM CSV into the columnar store.')
+    parser.add_argument('csv', nargs='?', default=CSV_PATH)
+    parser.add_argument('-o', '--output', default=STORE_DIR)
+    args = parser.parse_args()
+    df = pd.read_csv(args.csv)
+    write_store(df, args.output)
+    print(f"{len(df):,} rows written to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
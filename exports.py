@@ -0,0 +1,109 @@
+"""Lazy, cached export payloads for the dashboard download buttons.
+
+Nothing is serialized until a user asks for a download. Each payload is
+built once on a worker thread, keyed by whatever identifies its content
+(filter state, top N, ...), and kept in a byte-bounded LRU shared by all
+sessions, so the script thread never waits on xlsxwriter or a large CSV.
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from cache import LRUCache
+
+CACHE_BYTES = 256 * 1024 * 1024
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def csv_bytes(df):
+    """``df`` as one UTF-8 CSV payload.
+
+    Built whole in memory rather than streamed: ``st.download_button``
+    needs the complete file as bytes (even a callable or file object is read
+    in full before the download starts).
+    """
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def excel_bytes(sheets):
+    """One workbook with a sheet per ``{sheet name: DataFrame}`` entry, built in memory."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, index=False, sheet_name=name)
+    return buffer.getvalue()
+
+
+class ExportManager:
+    """Builds export payloads on demand in the background and memoizes them."""
+
+    def __init__(self, max_bytes=CACHE_BYTES, max_workers=2, cache=None):
+        # ``cache`` must refuse values larger than its byte budget, as LRUCache does.
+        self._cache = LRUCache(maxsize=256, max_bytes=max_bytes) if cache is None else cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._pending = {}
+        self._oversized = None
+        self._build_seconds = LRUCache(maxsize=1024)
+        self._lock = threading.Lock()
+
+    def _future(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def get(self, key):
+        """The finished payload for ``key``, or ``None``."""
+        payload = self._cache.get(key)
+        if payload is None:
+            future = self._future(key)
+            if future is not None and future.done() and future.exception() is None:
+                payload = future.result()
+        return payload
+
+    def status(self, key):
+        """``'ready'``, ``'pending'``, ``'failed'`` or ``None`` if never requested."""
+        if key in self._cache:
+            return 'ready'
+        future = self._future(key)
+        if future is None:
+            return None
+        if not future.done():
+            return 'pending'
+        return 'failed' if future.exception() is not None else 'ready'
+
+    def build_seconds(self, key):
+        """Wall time the background build of ``key`` took, or ``None`` if it has not finished."""
+        return self._build_seconds.get(key)
+
+    def error(self, key):
+        future = self._future(key)
+        return future.exception() if future is not None and future.done() else None
+
+    def submit(self, key, build, *args):
+        """Start building ``key`` with ``build(*args)`` unless it is cached or in flight."""
+        with self._lock:
+            future = self._pending.get(key)
+            if key in self._cache or (future is not None and (not future.done() or future.exception() is None)):
+                return future
+            future = self._executor.submit(self._build, key, build, *args)
+            self._pending[key] = future
+            return future
+
+    def _build(self, key, build, *args):
+        start = time.perf_counter()
+        payload = build(*args)
+        self._build_seconds.put(key, time.perf_counter() - start)
+        self._cache.put(key, payload)
+        with self._lock:
+            if key in self._cache:
+                self._pending.pop(key, None)
+            else:
+                # Too large for the cache budget: only the latest such payload
+                # stays reachable through its future.
+                if self._oversized not in (None, key):
+                    self._pending.pop(self._oversized, None)
+                self._oversized = key
+        # Failed builds keep their future too, so the error can be shown.
+        return payload
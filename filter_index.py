@@ -0,0 +1,137 @@
+"""Precomputed index for the sidebar filters.
+
+The index is built once per dataset load and answers the Recency/Frequency/
+Monetary range sliders plus the optional categorical dropdown with row
+positions instead of boolean masks over the whole table:
+
+* every range column keeps a stable ``argsort`` order and the sorted values,
+  so a ``[lo, hi]`` slider maps to a contiguous slice found by binary search;
+* every categorical column keeps its integer codes and the positions of each
+  code, so an equality filter is a slice as well.
+
+A query starts from the most selective of those slices and checks the
+remaining conditions only on the surviving positions. Results are memoized
+per filter tuple in a bounded LRU, or in the shared ``cache`` passed in.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+RANGE_COLUMNS = ['Recency', 'Frequency', 'Monetary']
+
+
+def filter_key(ranges=None, equals=None):
+    """Hashable key for a filter state, for memoizing anything derived from it."""
+    return (tuple(sorted((ranges or {}).items())), tuple(sorted((equals or {}).items())))
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def _as_column_type(values, bound):
+    # Compare in the column's own float precision, as a boolean mask over the
+    # column does: float32(741.26) is above the float64 slider value 741.26.
+    return values.dtype.type(bound) if values.dtype.kind == 'f' else bound
+
+
+class FilterIndex:
+    def __init__(self, df, range_columns=RANGE_COLUMNS, categorical_columns=(), cache_size=128, cache=None):
+        self.n_rows = len(df)
+        self._ranges = {}
+        for col in range_columns:
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind='stable')
+            self._ranges[col] = (values, order, values[order])
+        self._categoricals = {}
+        for col in categorical_columns:
+            codes, uniques = pd.factorize(df[col])
+            # Alphabetical, like the dropdown; factorize(sort=True) keeps a categorical's category order.
+            by_value = sorted(range(len(uniques)), key=lambda code: uniques[code])
+            new_code = np.empty(len(uniques), dtype=np.intp)
+            new_code[by_value] = np.arange(len(uniques))
+            codes = np.where(codes >= 0, new_code[np.maximum(codes, 0)], -1) if len(uniques) else codes
+            uniques = [uniques[code] for code in by_value]
+            valid = codes >= 0
+            order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+            starts = np.concatenate(([0], np.cumsum(np.bincount(codes[valid], minlength=len(uniques)))))
+            lookup = {value: code for code, value in enumerate(uniques)}
+            self._categoricals[col] = (codes, list(uniques), lookup, order, starts)
+        self._cache = LRUCache(cache_size) if cache is None else cache
+
+    def bounds(self, col):
+        """``(min, max)`` of a range column, ignoring missing values."""
+        sorted_values = self._ranges[col][2]
+        return sorted_values[0], sorted_values[self._n_valid(sorted_values) - 1]
+
+    @staticmethod
+    def _n_valid(sorted_values):
+        if sorted_values.dtype.kind != 'f':
+            return len(sorted_values)
+        # NaNs sort last, so the first one marks the end of the valid values.
+        return int(np.searchsorted(sorted_values, np.nan, side='left'))
+
+    def sorted_column(self, col):
+        """``(order, sorted_values, n_valid)`` for a range column; NaNs sort last."""
+        _, order, sorted_values = self._ranges[col]
+        return order, sorted_values, self._n_valid(sorted_values)
+
+    def options(self, col):
+        """Sorted distinct non-null values of a categorical column."""
+        return self._categoricals[col][1]
+
+    def _range_slice(self, col, lo, hi):
+        _, order, sorted_values = self._ranges[col]
+        lo, hi = _as_column_type(sorted_values, lo), _as_column_type(sorted_values, hi)
+        start = np.searchsorted(sorted_values, lo, side='left')
+        stop = np.searchsorted(sorted_values, hi, side='right')
+        return order[start:stop]
+
+    def _equals_slice(self, col, value):
+        _, _, lookup, order, starts = self._categoricals[col]
+        code = lookup.get(value)
+        if code is None:
+            return order[:0]
+        return order[starts[code]:starts[code + 1]]
+
+    def query(self, ranges=None, equals=None):
+        """Row positions (ascending) matching every range and equality filter.
+
+        ``ranges`` maps a range column to an inclusive ``(lo, hi)`` tuple and
+        ``equals`` maps a categorical column to the required value. The
+        returned array is shared with the cache and is read-only.
+        """
+        ranges = dict(ranges or {})
+        equals = dict(equals or {})
+        return self._cache.get_or_compute(filter_key(ranges, equals), self._query, ranges, equals)
+
+    def _query(self, ranges, equals):
+        candidates = []
+        for col, (lo, hi) in ranges.items():
+            positions = self._range_slice(col, lo, hi)
+            if len(positions) < self.n_rows:
+                candidates.append((len(positions), 'range', col, (lo, hi), positions))
+        for col, value in equals.items():
+            positions = self._equals_slice(col, value)
+            candidates.append((len(positions), 'equals', col, value, positions))
+        if not candidates:
+            return _read_only(np.arange(self.n_rows))
+
+        candidates.sort(key=lambda c: c[0])
+        _, kind, _, _, positions = candidates[0]
+        # Range slices come out in value order; categorical slices are already ascending.
+        positions = np.sort(positions) if kind == 'range' else positions.copy()
+        for _, kind, col, condition, _ in candidates[1:]:
+            if not len(positions):
+                break
+            if kind == 'range':
+                values = self._ranges[col][0][positions]
+                lo, hi = (_as_column_type(values, bound) for bound in condition)
+                keep = (values >= lo) & (values <= hi)
+            else:
+                codes = self._categoricals[col][0][positions]
+                keep = codes == self._categoricals[col][2].get(condition, -2)
+            positions = positions[keep]
+        return _read_only(positions)
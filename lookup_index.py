@@ -0,0 +1,69 @@
+"""Exact and prefix CustomerID lookup.
+
+CustomerIDs arrive as floats (``17850.0``), so the old substring search over
+``astype(str)`` both rescanned the column on every keystroke and matched
+``'17850'`` inside ``'178500.0'``. The index normalizes IDs to integers once
+and keeps two sorted views of them:
+
+* the integer IDs, for exact matches;
+* their decimal strings, for prefix matches while an ID is being typed.
+
+Both are answered with ``searchsorted`` in O(log n).
+"""
+import numpy as np
+
+
+def normalize_ids(customer_ids):
+    """CustomerIDs as int64; missing IDs become -1."""
+    ids = np.asarray(customer_ids, dtype=np.float64)
+    return np.where(np.isnan(ids), -1, np.round(ids)).astype(np.int64)
+
+
+def within(positions, allowed):
+    """Keep the ``positions`` that also appear in the ascending ``allowed`` array."""
+    if not len(allowed):
+        return positions[:0]
+    idx = np.searchsorted(allowed, positions)
+    idx[idx == len(allowed)] = 0
+    return positions[allowed[idx] == positions]
+
+
+class LookupIndex:
+    def __init__(self, customer_ids):
+        ids = normalize_ids(customer_ids)
+        valid = np.flatnonzero(ids >= 0)
+        self._id_order = valid[np.argsort(ids[valid], kind='stable')]
+        self._sorted_ids = ids[self._id_order]
+        width = len(str(self._sorted_ids[-1])) if len(valid) else 1
+        strings = self._sorted_ids.astype(f'S{width}')
+        str_order = np.argsort(strings, kind='stable')
+        self._str_order = self._id_order[str_order]
+        self._sorted_strings = strings[str_order]
+
+    def exact(self, customer_id):
+        start = np.searchsorted(self._sorted_ids, customer_id, side='left')
+        stop = np.searchsorted(self._sorted_ids, customer_id, side='right')
+        return np.sort(self._id_order[start:stop])
+
+    def prefix(self, text):
+        text = text.encode('ascii')
+        upper = text[:-1] + bytes([text[-1] + 1])
+        start = np.searchsorted(self._sorted_strings, text, side='left')
+        stop = np.searchsorted(self._sorted_strings, upper, side='left')
+        return np.sort(self._str_order[start:stop])
+
+    def lookup(self, query):
+        """Row positions for a typed CustomerID.
+
+        An exact ID match wins (``'17850'`` and ``'17850.0'`` are the same
+        ID); otherwise every ID starting with the typed digits is returned.
+        """
+        query = query.strip()
+        if query.endswith('.0'):
+            query = query[:-2]
+        if not (query.isascii() and query.isdigit()):
+            return np.array([], dtype=np.int64)
+        matches = self.exact(int(query))
+        if not len(matches):
+            matches = self.prefix(query)
+        return matches
@@ -0,0 +1,140 @@
+"""KMeans model selection over a range of k.
+
+Replaces the serial elbow loop in ``Elbow_Method.ipynb`` /
+``k_means_clustering.ipynb``: every k is fitted in its own worker process,
+large customer bases can use ``MiniBatchKMeans`` and/or a random subsample,
+and each k reports inertia, a sampled silhouette score and its fit time.
+The fitted model for the chosen k is reused for the final labels instead of
+being refitted from scratch, and the scaler and centroids are saved::
+
+    python model_selection.py RFM_Table.csv --k 4
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+import columnar
+from cluster_model import FEATURES, MODEL_PATH, save_labels, save_model
+
+K_RANGE = range(1, 11)
+MINIBATCH_THRESHOLD = 100_000
+SILHOUETTE_SAMPLE = 10_000
+RANDOM_STATE = 42
+
+_worker_X = None
+
+
+def scale_features(df):
+    """Standard-scale the RFM columns; returns ``(scaled, scaler)``."""
+    scaler = StandardScaler()
+    return scaler.fit_transform(df[FEATURES].to_numpy(dtype=np.float64)), scaler
+
+
+def _init_worker(X):
+    global _worker_X
+    _worker_X = X
+
+
+def fit_k(k, X=None, method='kmeans', sample_size=None, silhouette_sample=SILHOUETTE_SAMPLE,
+          random_state=RANDOM_STATE):
+    """Fit one k and score it on the full matrix.
+
+    ``method`` is ``'kmeans'`` or ``'minibatch'``; with ``sample_size`` the
+    model is fitted on that many random rows only. Returns a dict with the
+    inertia, sampled silhouette (NaN for k=1), fit seconds and centroids.
+    """
+    X = _worker_X if X is None else X
+    rng = np.random.default_rng(random_state)
+    fit_X = X if sample_size is None or sample_size >= len(X) else X[rng.choice(len(X), sample_size, replace=False)]
+
+    start = time.perf_counter()
+    model_cls = MiniBatchKMeans if method == 'minibatch' else KMeans
+    model = model_cls(n_clusters=k, random_state=random_state).fit(fit_X)
+    fit_seconds = time.perf_counter() - start
+
+    labels = model.predict(X)
+    inertia = -model.score(X)
+    silhouette = np.nan
+    if k > 1 and len(np.unique(labels)) > 1:
+        silhouette = silhouette_score(X, labels, sample_size=min(silhouette_sample, len(X)),
+                                      random_state=random_state)
+    return {
+        'k': k,
+        'inertia': float(inertia),
+        'silhouette': float(silhouette),
+        'fit_seconds': fit_seconds,
+        'centroids': model.cluster_centers_,
+    }
+
+
+def select_k(X, k_range=K_RANGE, method='auto', sample_size=None, n_jobs=None,
+             silhouette_sample=SILHOUETTE_SAMPLE, random_state=RANDOM_STATE):
+    """Fit every k in ``k_range`` across a process pool.
+
+    ``method='auto'`` switches to MiniBatchKMeans above
+    ``MINIBATCH_THRESHOLD`` rows. Returns one result dict per k, in order.
+    """
+    if method == 'auto':
+        method = 'minibatch' if len(X) > MINIBATCH_THRESHOLD else 'kmeans'
+    kwargs = dict(method=method, sample_size=sample_size, silhouette_sample=silhouette_sample,
+                  random_state=random_state)
+    # spawn, not fork: the dashboard calls this from a worker thread.
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(X,)) as pool:
+        futures = [pool.submit(fit_k, k, **kwargs) for k in k_range]
+        return [future.result() for future in futures]
+
+
+def summary(results):
+    """Per-k inertia, silhouette and timing as a DataFrame (no centroids)."""
+    return pd.DataFrame([{key: r[key] for key in ('k', 'inertia', 'silhouette', 'fit_seconds')} for r in results])
+
+
+def elbow_k(results):
+    """k at the elbow: the point farthest from the line joining the first and last inertia."""
+    k = np.array([r['k'] for r in results], dtype=np.float64)
+    inertia = np.array([r['inertia'] for r in results])
+    if len(k) < 3:
+        return int(k[0])
+    x = (k - k[0]) / (k[-1] - k[0])
+    y = (inertia - inertia[-1]) / max(inertia[0] - inertia[-1], 1e-12)
+    return int(k[np.argmax(np.abs(x + y - 1))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit KMeans for a range of k in parallel and save the chosen model.')
+    parser.add_argument('rfm', nargs='?', default='RFM_Table.csv')
+    parser.add_argument('--k-min', type=int, default=1)
+    parser.add_argument('--k-max', type=int, default=10)
+    parser.add_argument('--k', type=int, help='k to keep (default: elbow of the inertia curve)')
+    parser.add_argument('--method', choices=['auto', 'kmeans', 'minibatch'], default='auto')
+    parser.add_argument('--sample-size', type=int, help='fit each k on this many random customers')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', default=columnar.CSV_PATH, help='RFM table with the chosen labels')
+    parser.add_argument('--store', default=columnar.STORE_DIR,
+                        help='columnar store the dashboard loads; rewritten when it exists')
+    args = parser.parse_args()
+
+    rfm_df = pd.read_csv(args.rfm)
+    X, scaler = scale_features(rfm_df)
+    results = select_k(X, range(args.k_min, args.k_max + 1), args.method, args.sample_size, args.jobs)
+    print(summary(results).to_string(index=False))
+
+    k = args.k or elbow_k(results)
+    chosen = next(r for r in results if r['k'] == k)
+    model = save_model(scaler, chosen['centroids'], args.model)
+    save_labels(model, rfm_df, args.output, args.store)
+    print(f"k={k} model saved to '{args.model}', labels saved to '{args.output}'"
+          + (f" and '{args.store}'" if columnar.has_store(args.store) else ''))
+
+
+if __name__ == '__main__':
+    main()
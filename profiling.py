@@ -0,0 +1,121 @@
+"""Per-stage wall time and memory for one dashboard rerun or benchmark run.
+
+Wrap each stage in ``with profiler.stage('filter'):``. Repeated stages are
+summed into a single row, and a stage opened inside another is recorded as
+``'outer/inner'``. Work handed to other threads (the dashboard's background
+export builds) is not covered and has to be timed where it runs. Wall time
+is always recorded with ``perf_counter``; memory is traced with
+``tracemalloc`` only when the profiler is created with ``memory=True``,
+since tracing slows every allocation down. ``tracemalloc`` is process-wide,
+so memory figures also include whatever concurrent sessions allocate while
+a stage runs.
+"""
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+import pandas as pd
+
+MB = 1024 * 1024
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+class Profiler:
+    def __init__(self, enabled=True, memory=False):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.records = {}
+        self._stack = []
+        if self.memory:
+            _start_tracing()
+            # A rerun can be cut short (st.rerun, an exception) before close().
+            self._finalizer = weakref.finalize(self, _stop_tracing)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of the ``with`` block under ``name``."""
+        if not self.enabled:
+            yield
+            return
+        path = '/'.join([f['name'] for f in self._stack] + [name])
+        frame = {'name': name, 'peak': 0}
+        # Reserve the row now so stages are listed in the order they start.
+        self.records.setdefault(path, {'calls': 0, 'seconds': 0.0, 'allocated': 0, 'peak': 0})
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # reset_peak() is global: keep the enclosing stage's peak so far.
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_bytes'] = current
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            allocated = peak = 0
+            if self.memory:
+                current, traced_peak = tracemalloc.get_traced_memory()
+                peak_bytes = max(frame['peak'], traced_peak)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak_bytes)
+                allocated = current - frame['start_bytes']
+                peak = peak_bytes - frame['start_bytes']
+            self._record(path, seconds, allocated, peak)
+
+    def _record(self, name, seconds, allocated, peak):
+        record = self.records[name]
+        record['calls'] += 1
+        record['seconds'] += seconds
+        record['allocated'] += allocated
+        record['peak'] = max(record['peak'], peak)
+
+    def close(self):
+        """Stop memory tracing; recorded figures are kept."""
+        if self.memory:
+            self._finalizer()
+            self.memory = False
+
+    def to_dict(self):
+        """``{stage: {calls, seconds, allocated_mb, peak_mb}}`` in the order they first started."""
+        return {
+            name: {
+                'calls': r['calls'],
+                'seconds': r['seconds'],
+                'allocated_mb': r['allocated'] / MB,
+                'peak_mb': r['peak'] / MB,
+            }
+            for name, r in self.records.items()
+        }
+
+    def table(self):
+        """The records as a DataFrame; ``share`` is of the top-level stages' total time."""
+        df = pd.DataFrame.from_dict(self.to_dict(), orient='index',
+                                    columns=['calls', 'seconds', 'allocated_mb', 'peak_mb'])
+        df.index.name = 'stage'
+        if not df.empty:
+            top_level = ~df.index.str.contains('/', regex=False)
+            df['share'] = df['seconds'] / df.loc[top_level, 'seconds'].sum()
+        return df
@@ -0,0 +1,193 @@
+"""Streaming RFM feature builder.
+
+Chunked equivalent of ``rfm_feature_creation.ipynb``: the transaction CSV is
+read ``chunksize`` rows at a time, cleaned with the same rules as the
+notebook, and folded into per-customer running aggregates held in NumPy
+arrays (last invoice timestamp, distinct invoice count, spend). Only those
+aggregates and the set of (customer, invoice) pairs already counted stay in
+memory, so transaction dumps larger than RAM can be processed. That set is
+what keeps Frequency an exact distinct count, and it grows with the number
+of invoices (8 bytes per distinct customer/invoice pair)::
+
+    python rfm_builder.py "E-Commerce data.csv" -o RFM_Table.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%m/%d/%Y %H:%M'
+ENCODING = 'ISO-8859-1'
+CHUNKSIZE = 100_000
+USECOLS = ['InvoiceNo', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID']
+DAY_NS = 86_400 * 10**9
+
+
+def pair_keys(slots, invoice_nos):
+    """64-bit hash of each (customer slot, InvoiceNo) pair."""
+    frame = pd.DataFrame({'slot': slots, 'invoice': np.asarray(invoice_nos, dtype=str)})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def clean_chunk(chunk, date_format=DATE_FORMAT):
+    """Apply the notebook's cleaning rules to one chunk of raw transactions."""
+    chunk = chunk[chunk['CustomerID'].notnull() & (chunk['Quantity'] > 0) & (chunk['UnitPrice'] > 0)]
+    dates = pd.to_datetime(chunk['InvoiceDate'], format=date_format, errors='coerce')
+    chunk = chunk.assign(InvoiceDate=dates)
+    return chunk[dates.notna()]
+
+
+class RFMAccumulator:
+    """Per-customer running Recency/Frequency/Monetary aggregates.
+
+    Customers get a dense slot the first time they are seen; the aggregates
+    are arrays indexed by slot. Frequency counts distinct InvoiceNo per
+    customer, so the :func:`pair_keys` already counted are kept, as a few
+    sorted runs that at least halve in size from one to the next. A batch is
+    looked up in every run with ``searchsorted`` and its new keys become the
+    last run; runs are merged once the one before is no more than twice its
+    size, so each key is merged O(log n) times. Counts are exact unless two
+    pairs share a 64-bit hash (odds about n**2 / 2**65 for n pairs).
+    """
+
+    def __init__(self):
+        self.customer_ids = np.empty(0, dtype=np.float64)
+        self.last_ts = np.empty(0, dtype=np.int64)
+        self.frequency = np.empty(0, dtype=np.int64)
+        self.monetary = np.empty(0, dtype=np.float64)
+        self._monetary_comp = np.empty(0, dtype=np.float64)
+        self.max_ts = None
+        self._slots = {}
+        self._seen_runs = []
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def _slots_for(self, customer_ids):
+        uniques, inverse = np.unique(customer_ids, return_inverse=True)
+        new_ids = [cid for cid in uniques.tolist() if cid not in self._slots]
+        if new_ids:
+            start = len(self.customer_ids)
+            self._slots.update(zip(new_ids, range(start, start + len(new_ids))))
+            self.customer_ids = np.concatenate([self.customer_ids, new_ids])
+            self.last_ts = np.concatenate([self.last_ts, np.full(len(new_ids), np.iinfo(np.int64).min)])
+            self.frequency = np.concatenate([self.frequency, np.zeros(len(new_ids), dtype=np.int64)])
+            self.monetary = np.concatenate([self.monetary, np.zeros(len(new_ids))])
+            self._monetary_comp = np.concatenate([self._monetary_comp, np.zeros(len(new_ids))])
+        slot_of_unique = np.fromiter((self._slots[cid] for cid in uniques.tolist()), dtype=np.int64, count=len(uniques))
+        return slot_of_unique[inverse]
+
+    def _new_pairs(self, keys):
+        new = np.ones(len(keys), dtype=bool)
+        for run in self._seen_runs:
+            idx = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            new &= run[idx] != keys
+        return new
+
+    def _add_run(self, keys):
+        runs = self._seen_runs
+        if len(keys):
+            runs.append(keys)
+        while len(runs) > 1 and len(runs[-2]) <= 2 * len(runs[-1]):
+            last = runs.pop()
+            # Runs are sorted and disjoint: timsort merges them in linear time.
+            runs[-1] = np.sort(np.concatenate([runs[-1], last]), kind='stable')
+
+    def seen_pairs(self):
+        """Every pair key counted so far, as one sorted array."""
+        if not self._seen_runs:
+            return np.empty(0, dtype=np.uint64)
+        return np.sort(np.concatenate(self._seen_runs))
+
+    def _add_monetary(self, slots, amounts):
+        # pandas' groupby sum is Kahan-compensated within the batch; each
+        # batch total is then added with one compensated step per customer.
+        # Totals agree with a single groupby over the whole history to within
+        # rounding, not bit for bit.
+        batch = pd.Series(np.asarray(amounts, dtype=np.float64)).groupby(slots).sum()
+        g, x = batch.index.to_numpy(), batch.to_numpy()
+        total, comp = self.monetary, self._monetary_comp
+        y = x - comp[g]
+        t = total[g] + y
+        comp[g] = (t - total[g]) - y
+        total[g] = t
+
+    def update(self, customer_ids, invoice_nos, invoice_ts, amounts):
+        """Fold a batch of clean transactions into the aggregates.
+
+        ``invoice_ts`` are ``datetime64[ns]`` values (or their int64 view)
+        and ``amounts`` the per-line ``Quantity * UnitPrice``. Returns the
+        slots touched by the batch.
+        """
+        if not len(customer_ids):
+            return np.empty(0, dtype=np.int64)
+        slots = self._slots_for(np.asarray(customer_ids, dtype=np.float64))
+        ts = np.asarray(invoice_ts).astype('datetime64[ns]').view(np.int64)
+
+        np.maximum.at(self.last_ts, slots, ts)
+        self._add_monetary(slots, amounts)
+        batch_max = int(ts.max())
+        self.max_ts = batch_max if self.max_ts is None else max(self.max_ts, batch_max)
+
+        keys, first = np.unique(pair_keys(slots, invoice_nos), return_index=True)
+        new = self._new_pairs(keys)
+        np.add.at(self.frequency, slots[first[new]], 1)
+        self._add_run(keys[new])
+        return np.unique(slots)
+
+    def update_chunk(self, chunk):
+        """Fold a cleaned transaction DataFrame into the aggregates."""
+        amounts = (chunk['Quantity'] * chunk['UnitPrice']).to_numpy(dtype=np.float64)
+        return self.update(chunk['CustomerID'].to_numpy(), chunk['InvoiceNo'].to_numpy(),
+                           chunk['InvoiceDate'].to_numpy(), amounts)
+
+    def reference_ts(self):
+        """Default reference date: one day after the last transaction."""
+        return self.max_ts + DAY_NS
+
+    def table(self, reference_date=None):
+        """RFM table sorted by CustomerID, as the notebook's groupby produces."""
+        ref = self.reference_ts() if reference_date is None else pd.Timestamp(reference_date).value
+        order = np.argsort(self.customer_ids, kind='stable')
+        return pd.DataFrame({
+            'CustomerID': self.customer_ids[order],
+            'Recency': (ref - self.last_ts[order]) // DAY_NS,
+            'Frequency': self.frequency[order],
+            'Monetary': self.monetary[order],
+        })
+
+
+def build_rfm(path, chunksize=CHUNKSIZE, date_format=DATE_FORMAT, encoding=ENCODING, accumulator=None):
+    """Stream a transaction CSV into an :class:`RFMAccumulator`."""
+    accumulator = RFMAccumulator() if accumulator is None else accumulator
+    reader = pd.read_csv(path, usecols=USECOLS, dtype={'InvoiceNo': str, 'InvoiceDate': str},
+                         encoding=encoding, chunksize=chunksize)
+    for chunk in reader:
+        accumulator.update_chunk(clean_chunk(chunk, date_format))
+    return accumulator
+
+
+def write_table(df, path):
+    """Write a table as Parquet when ``path`` ends in ``.parquet``, else CSV."""
+    if str(path).endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build RFM_Table.csv from a transaction CSV in chunks.')
+    parser.add_argument('transactions', help='raw transaction CSV (E-Commerce data.csv layout)')
+    parser.add_argument('-o', '--output', default='RFM_Table.csv', help='.csv or .parquet output path')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--date-format', default=DATE_FORMAT)
+    parser.add_argument('--encoding', default=ENCODING)
+    args = parser.parse_args()
+
+    accumulator = build_rfm(args.transactions, args.chunksize, args.date_format, args.encoding)
+    write_table(accumulator.table(), args.output)
+    print(f"RFM table for {len(accumulator):,} customers saved as '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Incremental RFM refresh from daily transaction deltas.
+
+Keeps the per-customer aggregates of :class:`rfm_builder.RFMAccumulator`
+(last purchase timestamp, distinct invoices, spend) in an ``.npz`` state
+file, so a new batch of ``cleaned_data.csv``-shaped rows is merged in time
+proportional to the batch instead of re-reading the full history. Recency
+is only derived when the tables are written, against the reference date of
+that run.
+
+Cluster labels are kept in the state as well, together with the model that
+produced them. After a merge, only the customers touched by the batch are
+reassigned to the nearest existing KMeans centroid; everyone else keeps
+their label until a ``--full`` reassignment. When the model has changed
+since (a new one saved from the dashboard or ``model_selection.py``), an
+update refuses to run without ``--full``, since keeping the old labels would
+mix two clusterings.
+
+Each merged batch file is recorded by the SHA-256 of its contents, and
+merging the same file again (a retried daily job, say) is refused: its
+spend would be added twice while its invoices, already counted, would leave
+Frequency unchanged. A new file that repeats only some earlier rows is not
+detected::
+
+    python rfm_state.py init cleaned_data.csv
+    python rfm_state.py update new_rows.csv
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from cluster_model import FEATURES, MODEL_PATH, ClusterModel, load_model
+from columnar import STORE_DIR, write_store
+from rfm_builder import CHUNKSIZE, DAY_NS, RFMAccumulator, clean_chunk
+
+STATE_PATH = 'rfm_state.npz'
+BATCH_DATE_FORMAT = 'ISO8601'
+
+
+def model_params(model):
+    """Scaler statistics and centroids of ``model`` as one flat array, to compare models."""
+    return np.concatenate([model.mean, model.scale, model.centroids.ravel()])
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 hex digest of a file's contents."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class RFMState(RFMAccumulator):
+    """RFM aggregates plus cluster labels, persisted between runs."""
+
+    def __init__(self):
+        super().__init__()
+        self.cluster = np.empty(0, dtype=np.int8)
+        self.dirty = np.empty(0, dtype=bool)
+        # Parameters of the model behind ``cluster``; empty when unknown.
+        self.model_params = np.empty(0)
+        # SHA-256 hex digests of the batch files merged so far.
+        self.batches = np.empty(0, dtype=str)
+
+    def update(self, customer_ids, invoice_nos, invoice_ts, amounts):
+        touched = super().update(customer_ids, invoice_nos, invoice_ts, amounts)
+        grow = len(self.customer_ids) - len(self.cluster)
+        if grow:
+            self.cluster = np.concatenate([self.cluster, np.full(grow, -1, dtype=np.int8)])
+            self.dirty = np.concatenate([self.dirty, np.ones(grow, dtype=bool)])
+        self.dirty[touched] = True
+        return touched
+
+    def merge_csv(self, path, chunksize=CHUNKSIZE, date_format=BATCH_DATE_FORMAT):
+        """Merge a batch of cleaned transactions; returns the number of customers touched.
+
+        Raises ``ValueError`` if a file with the same contents was merged before.
+        """
+        digest = file_digest(path)
+        if digest in self.batches:
+            raise ValueError(f"'{path}' has already been merged into this state")
+        before = self.dirty.sum()
+        for chunk in pd.read_csv(path, dtype={'InvoiceNo': str, 'InvoiceDate': str}, chunksize=chunksize):
+            self.update_chunk(clean_chunk(chunk, date_format))
+        self.batches = np.append(self.batches, digest)
+        return int(self.dirty.sum() - before)
+
+    def features(self, slots, reference_ts):
+        recency = (reference_ts - self.last_ts[slots]) // DAY_NS
+        return np.column_stack([recency, self.frequency[slots], self.monetary[slots]])
+
+    def seed_labels(self, rfm_clustered, model=None):
+        """Take labels from an existing ``RFM_Clustered.csv``; matched customers become clean.
+
+        ``model`` is the one the labels were assigned with, if known.
+        """
+        slots = np.array([self._slots.get(cid, -1) for cid in rfm_clustered['CustomerID'].tolist()], dtype=np.int64)
+        known = slots >= 0
+        labels = rfm_clustered['Cluster'].to_numpy()
+        self.cluster[slots[known]] = labels[known]
+        self.dirty[slots[known]] = False
+        if model is not None and (not len(labels) or labels.max() < model.n_clusters):
+            self.model_params = model_params(model)
+
+    def labelled_by(self, model):
+        """Whether the stored labels were assigned with ``model``."""
+        return np.array_equal(self.model_params, model_params(model))
+
+    def assign(self, model, reference_ts=None, full=False):
+        """Assign dirty (or, with ``full``, all) customers with a :class:`ClusterModel`.
+
+        Raises ``ValueError`` when only dirty customers would be assigned but
+        the others were labelled with a different model.
+        """
+        if not full and not self.labelled_by(model) and not self.dirty.all():
+            raise ValueError('the cluster model differs from the one the stored labels were assigned with; '
+                             'reassign every customer with full=True (--full)')
+        reference_ts = self.reference_ts() if reference_ts is None else reference_ts
+        slots = np.arange(len(self)) if full else np.flatnonzero(self.dirty)
+        if len(slots):
+            self.cluster[slots] = model.predict(self.features(slots, reference_ts))
+        self.dirty[:] = False
+        self.model_params = model_params(model)
+        return len(slots)
+
+    def clustered_table(self, reference_date=None):
+        table = self.table(reference_date)
+        order = np.argsort(self.customer_ids, kind='stable')
+        return table.assign(Cluster=self.cluster[order].astype(np.int64))
+
+    def save(self, path=STATE_PATH):
+        np.savez(
+            path,
+            customer_ids=self.customer_ids,
+            last_ts=self.last_ts,
+            frequency=self.frequency,
+            monetary=self.monetary,
+            monetary_comp=self._monetary_comp,
+            max_ts=np.array([self.max_ts if self.max_ts is not None else np.iinfo(np.int64).min]),
+            pair_keys=self.seen_pairs(),
+            cluster=self.cluster,
+            dirty=self.dirty,
+            model_params=self.model_params,
+            batches=self.batches,
+        )
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        state = cls()
+        with np.load(path, allow_pickle=False) as data:
+            state.customer_ids = data['customer_ids']
+            state.last_ts = data['last_ts']
+            state.frequency = data['frequency']
+            state.monetary = data['monetary']
+            state._monetary_comp = data['monetary_comp']
+            max_ts = int(data['max_ts'][0])
+            state.max_ts = None if max_ts == np.iinfo(np.int64).min else max_ts
+            pairs = data['pair_keys']
+            state._seen_runs = [pairs] if len(pairs) else []
+            state.cluster = data['cluster']
+            state.dirty = data['dirty']
+            state.model_params = data['model_params']
+            state.batches = data['batches']
+        state._slots = {cid: slot for slot, cid in enumerate(state.customer_ids.tolist())}
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally refresh RFM_Table.csv and RFM_Clustered.csv.')
+    parser.add_argument('command', choices=['init', 'update'],
+                        help='init: build the state from a full history; update: merge a delta batch')
+    parser.add_argument('transactions', help='cleaned_data.csv-shaped transaction file')
+    parser.add_argument('--state', default=STATE_PATH)
+    parser.add_argument('--table', default='RFM_Table.csv')
+    parser.add_argument('--clustered', default='RFM_Clustered.csv',
+                        help='existing clustered table; supplies the labels and is rewritten')
+    parser.add_argument('--model', default=MODEL_PATH,
+                        help='saved cluster model (rebuilt from --clustered when missing)')
+    parser.add_argument('--store', default=STORE_DIR, help='columnar store the dashboard loads')
+    parser.add_argument('--reference-date', help='date Recency is measured from (default: day after last purchase)')
+    parser.add_argument('--full', action='store_true', help='reassign every customer, not only the changed ones')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    previous = pd.read_csv(args.clustered)
+    if os.path.exists(args.model):
+        model = load_model(args.model)
+    else:
+        # No saved model yet: rebuild it from the existing labels and keep it
+        # for later updates, which must use the same model.
+        model = ClusterModel.from_labels(previous[FEATURES].to_numpy(), previous['Cluster'].to_numpy())
+        model.save(args.model)
+    if args.command == 'init':
+        state = RFMState()
+        state.merge_csv(args.transactions, args.chunksize)
+        # The clustered table is written together with the model it was labelled with.
+        state.seed_labels(previous, model)
+    else:
+        state = RFMState.load(args.state)
+        if not args.full and not state.labelled_by(model):
+            parser.error(f"'{args.model}' is not the model the stored labels were assigned with; "
+                         "rerun with --full to reassign every customer")
+        try:
+            touched = state.merge_csv(args.transactions, args.chunksize)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"Merged batch: {touched:,} customers changed")
+
+    reference_ts = None if args.reference_date is None else pd.Timestamp(args.reference_date).value
+    assigned = state.assign(model, reference_ts, full=args.full)
+    state.save(args.state)
+
+    clustered = state.clustered_table(args.reference_date)
+    clustered.drop(columns='Cluster').to_csv(args.table, index=False)
+    clustered.to_csv(args.clustered, index=False)
+    write_store(clustered, args.store)
+    print(f"{assigned:,} customers assigned to clusters; {len(state):,} customers saved to "
+          f"'{args.table}', '{args.clustered}' and '{args.store}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Vectorized RFM ranking and customer category assignment.
+
+Drop-in replacement for the ``qcut_with_dynamic_labels`` / ``customer_category``
+pair that used to live in ``app.py``. Ranks are computed from NumPy quantile
+edges with ``searchsorted`` and categories come from a single ``np.select``
+decision table, so the cost is a few passes over three arrays instead of one
+Python call per customer.
+"""
+import numpy as np
+import pandas as pd
+
+R_LABELS = [4, 3, 2, 1]
+F_LABELS = [1, 2, 3, 4]
+M_LABELS = [1, 2, 3, 4]
+
+# Decision table, evaluated top to bottom like the old if/elif chain.
+CATEGORIES = ['High Value', 'Active', 'At Risk', 'Inactive']
+CATEGORY_DESCRIPTIONS = [
+    'Recent, frequent, and high spenders',
+    'Recent and frequent, moderate spend',
+    'Used to spend, but not recent',
+    'Not recent, low spend/frequency',
+]
+
+
+def _quantile_edges(values, n_bins):
+    finite = values[~np.isnan(values)]
+    if finite.size == 0:
+        return np.array([])
+    return np.unique(np.quantile(finite, np.linspace(0, 1, n_bins + 1)))
+
+
+def quantile_rank(values, q, label_order):
+    """Bin ``values`` into ``q`` quantiles labelled with ``label_order``.
+
+    Mirrors ``pd.qcut(..., duplicates='drop')`` as used by the dashboard:
+    when duplicate edges collapse the bins, the column is re-binned with the
+    reduced bin count, and if that still fails every row gets the first
+    label. Returns an ordered ``pd.Categorical``; NaN inputs stay missing.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_bins = len(_quantile_edges(values, q)) - 1
+    edges = _quantile_edges(values, n_bins) if n_bins >= 2 else np.array([])
+    if n_bins < 2 or len(edges) - 1 != n_bins:
+        labels = label_order[:1]
+        codes = np.zeros(len(values), dtype=np.int8)
+    else:
+        labels = label_order[:n_bins]
+        # qcut bins are right-closed with the lowest edge included.
+        codes = np.searchsorted(edges, values, side='left') - 1
+        codes = np.clip(codes, 0, n_bins - 1).astype(np.int8)
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def rank_values(rank):
+    """Rank labels of a categorical as a float array (NaN where missing)."""
+    categories = np.asarray(rank.categories, dtype=np.float64)
+    codes = np.asarray(rank.codes)
+    return np.where(codes >= 0, categories[codes], np.nan)
+
+
+def customer_categories(r_rank, f_rank, m_rank):
+    """Assign ``(Category, Category_Desc)`` from R/F/M rank arrays."""
+    r, f, m = (np.asarray(x, dtype=np.float64) for x in (r_rank, f_rank, m_rank))
+    conditions = [
+        (r == 4) & (f == 4) & (m == 4),
+        (r >= 3) & (f >= 3),
+        (r <= 2) & ((f >= 3) | (m >= 3)),
+    ]
+    codes = np.select(conditions, [0, 1, 2], default=3).astype(np.int8)
+    category = pd.Categorical.from_codes(codes, categories=CATEGORIES)
+    description = pd.Categorical.from_codes(codes, categories=CATEGORY_DESCRIPTIONS)
+    return category, description
+
+
+def rank(recency, frequency, monetary, q=4):
+    """``{'R_rank', 'F_rank', 'M_rank'}`` categoricals for the three RFM columns."""
+    return {
+        'R_rank': quantile_rank(recency, q, R_LABELS),
+        'F_rank': quantile_rank(frequency, q, F_LABELS),
+        'M_rank': quantile_rank(monetary, q, M_LABELS),
+    }
+
+
+def categorize(ranks):
+    """``{'Category', 'Category_Desc'}`` categoricals from the output of :func:`rank`."""
+    category, description = customer_categories(*(rank_values(ranks[col]) for col in ('R_rank', 'F_rank', 'M_rank')))
+    return {'Category': category, 'Category_Desc': description}
+
+
+def segment(recency, frequency, monetary, q=4, index=None):
+    """Compute R/F/M ranks and customer categories in one go.
+
+    Returns a DataFrame with ``R_rank``, ``F_rank``, ``M_rank``, ``Category``
+    and ``Category_Desc`` columns, all categorical, aligned to ``index``.
+    """
+    ranks = rank(recency, frequency, monetary, q)
+    return pd.DataFrame({**ranks, **categorize(ranks)}, index=index)
@@ -0,0 +1,65 @@
+"""One read-only dataset and one memo cache for every dashboard session.
+
+``SharedDataset`` is built once per data version (``app.py`` keeps it in
+``st.cache_resource``) and handed to every session by reference: the
+clustered RFM table with its segments, the lookup/filter/Top N/chart/table
+structures, the export manager, and a :class:`cache.MemoCache` that all of
+them memoize into. Derived results are keyed by filter state, so when two
+analysts look at the same filters the positions, quantiles, rankings,
+aggregates and payloads are computed once and reused by both. A filter state
+is represented by its row positions only: the filtered rows are taken from
+the table when something needs them as a frame (a preview, an export).
+
+The table's columns are memory maps when loaded from the columnar store, so
+separate server processes share the page cache too. Sessions only ever see
+read-only views of them (pandas copy-on-write hands out read-only arrays),
+and cached results are replaced, never modified in place.
+"""
+import columnar
+import exports
+import stages
+from cache import MemoCache
+from filter_index import filter_key
+from profiling import Profiler
+
+MEMO_BYTES = 512 * 1024 * 1024
+
+
+class SharedDataset:
+    def __init__(self, df, lookup_index, categorical_cols=None, memo_bytes=MEMO_BYTES, profiler=None):
+        profiler = profiler or Profiler(enabled=False)
+        self.df = df
+        self.lookup_index = lookup_index
+        self.categorical_cols = stages.categorical_columns(df) if categorical_cols is None else list(categorical_cols)
+        self.memo = MemoCache(max_bytes=memo_bytes)
+        self.filter_index, self.top_n, self.aggregator, self.table_view = stages.build_components(
+            df, tuple(self.categorical_cols), profiler, self.memo)
+        self.exports = exports.ExportManager(cache=self.memo.namespace('export'))
+        self._summaries = self.memo.namespace('summary')
+
+    @classmethod
+    def load(cls, store=columnar.STORE_DIR, csv=columnar.CSV_PATH, profiler=None, **kwargs):
+        """Load the clustered table, segment it and build the shared structures."""
+        profiler = profiler or Profiler(enabled=False)
+        with profiler.stage('load'):
+            df, lookup_index = stages.load_data(store, csv)
+        with profiler.stage('segment'):
+            df = df.assign(**stages.segment(df, profiler))
+        return cls(df, lookup_index, profiler=profiler, **kwargs)
+
+    def filtered(self, ranges, equals):
+        """``(positions, filter_state)``; the positions are shared by every session with the same filters."""
+        return self.filter_index.query(ranges, equals), filter_key(ranges, equals)
+
+    def rows(self, positions):
+        """The table's rows at ``positions``, as a new frame (not cached)."""
+        return self.df.iloc[positions]
+
+    def recommendation_quantiles(self, state, positions):
+        """Memoized :func:`stages.recommendation_quantiles` for a filter state."""
+        return self._summaries.get_or_compute(
+            ('quantiles', state), stages.recommendation_quantiles, self.df, positions)
+
+    def kpis(self, state, positions):
+        """``(distinct customers, average spend)`` for a filter state."""
+        return self._summaries.get_or_compute(('kpis', state), stages.kpis, self.df, positions)
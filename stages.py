@@ -0,0 +1,172 @@
+"""The dashboard's data work as plain, timed functions.
+
+``app.py`` calls these through ``shared.SharedDataset`` and ``benchmark.py``
+runs :func:`rerun` on one headless, so both measure the same code. Each
+step is wrapped in a :class:`profiling.Profiler` stage:
+
+=========== ==========================================================
+load        read the columnar store / CSV, score missing clusters
+segment     ``rank`` (R/F/M quantile ranks) and ``categorize``
+index       build the filter, Top N, chart and table structures
+filter      answer the sidebar sliders/dropdown
+lookup      CustomerID lookup within the filtered rows
+kpis        distinct customers and average spend of the filtered rows
+top-n       the three Top N rankings
+aggregate   histogram bins and category counts for the charts
+table       style one page of the customer table
+export      CSV/Excel payloads and the histogram PNG (headless only: the
+            dashboard builds them in the background and lists build times)
+=========== ==========================================================
+"""
+import os
+
+import pandas as pd
+import plotly.express as px
+
+import cluster_model
+import columnar
+import exports
+import segmentation
+from aggregations import Aggregator
+from filter_index import FilterIndex
+from lookup_index import LookupIndex, within
+from profiling import Profiler
+from table_view import TableView
+from top_n import TopN
+
+RANK_COLUMNS = ('R_rank', 'F_rank', 'M_rank')
+
+_NOT_PROFILED = Profiler(enabled=False)
+
+
+def load_data(store=columnar.STORE_DIR, csv=columnar.CSV_PATH, model_path=cluster_model.MODEL_PATH):
+    """``(rfm_clustered, lookup_index)``; customers without a Cluster are scored against the saved model."""
+    rfm_clustered = columnar.load_rfm(store, csv)
+    if 'Cluster' not in rfm_clustered.columns and os.path.exists(model_path):
+        rfm_clustered['Cluster'] = cluster_model.assign_clusters(
+            rfm_clustered['Recency'], rfm_clustered['Frequency'], rfm_clustered['Monetary'],
+            model=cluster_model.load_model(model_path))
+    lookup_index = LookupIndex(rfm_clustered['CustomerID'].to_numpy())
+    return rfm_clustered, lookup_index
+
+
+def segment(df, profiler=_NOT_PROFILED):
+    """R/F/M ranks and customer categories, as ``segmentation.segment``."""
+    with profiler.stage('rank'):
+        ranks = segmentation.rank(df['Recency'].to_numpy(), df['Frequency'].to_numpy(), df['Monetary'].to_numpy())
+    with profiler.stage('categorize'):
+        categories = segmentation.categorize(ranks)
+    return pd.DataFrame({**ranks, **categories}, index=df.index)
+
+
+def categorical_columns(df):
+    """Columns offered in the sidebar's categorical dropdown."""
+    return [col for col in df.columns
+            if (df[col].dtype == 'object' or isinstance(df[col].dtype, pd.CategoricalDtype))
+            and col not in ('CustomerID',) + RANK_COLUMNS]
+
+
+def lookup(lookup_index, df, query, positions):
+    """Rows of ``df`` whose CustomerID matches ``query``, among the filtered ``positions``."""
+    return df.iloc[within(lookup_index.lookup(query), positions)]
+
+
+def _column_at(df, col, positions):
+    # One column at the filtered positions, without taking the other columns' rows.
+    return pd.Series(df[col].to_numpy()[positions])
+
+
+def recommendation_quantiles(df, positions):
+    """Recency/Frequency quartiles and the Monetary 75th percentile of the rows at ``positions``."""
+    return (
+        _column_at(df, 'Recency', positions).quantile([0.25, 0.75]).to_numpy(),
+        _column_at(df, 'Frequency', positions).quantile([0.25, 0.75]).to_numpy(),
+        _column_at(df, 'Monetary', positions).quantile(0.75),
+    )
+
+
+def kpis(df, positions):
+    """``(distinct customers, average spend)`` of the rows at ``positions``."""
+    return _column_at(df, 'CustomerID', positions).nunique(), _column_at(df, 'Monetary', positions).mean()
+
+
+def histogram_figure(hist_bins, rfm_var, log_bins=False):
+    """Plotly bar chart of a pre-binned histogram (see ``aggregations.histogram_frame``)."""
+    hist_fig = px.bar(hist_bins, x='start', y='count', hover_data={'start': False, 'range': True}, labels={'start': rfm_var, 'range': rfm_var}, title=f"{rfm_var} Distribution", color_discrete_sequence=px.colors.qualitative.Pastel, log_x=log_bins)
+    hist_fig.update_traces(width=hist_bins['width'], offset=0)
+    hist_fig.update_layout(bargap=0)
+    return hist_fig
+
+
+def build_components(df, categorical_cols=(), profiler=_NOT_PROFILED, memo=None):
+    """``(filter_index, top_n, aggregator, table_view)`` for ``df``.
+
+    With a ``cache.MemoCache`` they all memoize into it, each under its own
+    namespace; otherwise each keeps a private LRU.
+    """
+    def namespace(name):
+        return None if memo is None else memo.namespace(name)
+    with profiler.stage('index'):
+        filter_index = FilterIndex(df, categorical_columns=categorical_cols, cache=namespace('filter'))
+        return (
+            filter_index,
+            TopN(df, filter_index, cache=namespace('top-n')),
+            Aggregator(df, cache=namespace('aggregate')),
+            TableView(df, cache=namespace('table')),
+        )
+
+
+def rerun(dataset, profiler=_NOT_PROFILED, ranges=None, equals=None, query='', top_n=10, page=1,
+          page_size=50, rfm_var='Monetary', log_bins=False, export=True):
+    """Everything one dashboard rerun computes on a ``shared.SharedDataset``, without rendering.
+
+    Goes through the same shared memo as ``app.py``, so a repeated filter
+    state is served from the cache. Returns the filtered positions. Export
+    payloads are built synchronously here (the dashboard builds them on its
+    export threads) and skipped when ``export`` is false; the PNG export is
+    skipped when kaleido is not installed.
+    """
+    with profiler.stage('filter'):
+        positions, state = dataset.filtered(ranges or {}, equals or {})
+    if query:
+        with profiler.stage('lookup'):
+            matches = lookup(dataset.lookup_index, dataset.df, query, positions)
+            if not matches.empty:
+                dataset.recommendation_quantiles(state, positions)
+    with profiler.stage('kpis'):
+        dataset.kpis(state, positions)
+    with profiler.stage('top-n'):
+        rankings = dataset.top_n.rankings(state, positions, top_n)
+    with profiler.stage('aggregate'):
+        dataset.aggregator.category_counts(state, positions, 'Category')
+        hist_bins = dataset.aggregator.histogram(state, positions, rfm_var, log=log_bins)
+    with profiler.stage('table'):
+        styled = dataset.table_view.styled_page(state, positions, page, page_size)
+        if not isinstance(styled, pd.DataFrame):
+            styled.to_html()
+    if export:
+        with profiler.stage('export'):
+            exports.csv_bytes(dataset.rows(positions))
+            exports.excel_bytes({'Most Recent': rankings['recent'], 'Most Frequent': rankings['frequent'],
+                                 'Top Monetary': rankings['monetary']})
+            try:
+                histogram_figure(hist_bins, rfm_var, log_bins).to_image('png')
+            except (ImportError, ValueError, RuntimeError):
+                pass
+    return positions
+
+
+def narrowed_ranges(filter_index, fraction=0.5):
+    """Slider ranges keeping the lower ``fraction`` of each range column's span."""
+    ranges = {}
+    for col in ('Recency', 'Frequency', 'Monetary'):
+        lo, hi = (float(v) for v in filter_index.bounds(col))
+        ranges[col] = (lo, lo + (hi - lo) * fraction)
+    return ranges
+
+
+def sample_query(df):
+    """The leading digits of a mid-table CustomerID, which match a handful of customers."""
+    if df.empty:
+        return ''
+    return str(int(df['CustomerID'].iloc[len(df) // 2]))[:3]
@@ -0,0 +1,57 @@
+"""Paginated, outlier-highlighted view of the customer table.
+
+Only the visible page is materialized, styled and sent to the browser. The
+1%/99% outlier thresholds are computed once per filter state and cached;
+each page is then styled from boolean masks over its own rows.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+OUTLIER_COLORS = {
+    'Recency': 'background-color: #ffe0e0',
+    'Frequency': 'background-color: #e0ffe0',
+    'Monetary': 'background-color: #e0e0ff',
+}
+PAGE_SIZES = [25, 50, 100, 250]
+QUANTILES = (0.01, 0.99)
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+class TableView:
+    def __init__(self, df, colors=OUTLIER_COLORS, cache_size=64, cache=None):
+        self.df = df
+        self.colors = {col: css for col, css in colors.items() if col in df.columns}
+        self._values = {col: df[col].to_numpy(dtype=np.float64) for col in self.colors}
+        self._cache = LRUCache(cache_size) if cache is None else cache
+
+    def thresholds(self, state_key, positions):
+        """``{column: (low, high)}`` outlier thresholds over the filtered rows."""
+        return self._cache.get_or_compute(state_key, self._thresholds, positions)
+
+    def _thresholds(self, positions):
+        if not len(positions):
+            return {}
+        return {col: tuple(np.nanquantile(values[positions], QUANTILES)) for col, values in self._values.items()}
+
+    def page(self, positions, page, page_size):
+        """Rows of one page, indexed by their row number in the filtered table."""
+        start = (page - 1) * page_size
+        page_positions = positions[start:start + page_size]
+        return self.df.iloc[page_positions].set_index(pd.RangeIndex(start, start + len(page_positions)))
+
+    def styled_page(self, state_key, positions, page, page_size):
+        """One page with outliers in Recency/Frequency/Monetary highlighted."""
+        page_df = self.page(positions, page, page_size)
+        thresholds = self.thresholds(state_key, positions)
+        if page_df.empty or not thresholds:
+            return page_df
+        css = pd.DataFrame('', index=page_df.index, columns=page_df.columns)
+        for col, (low, high) in thresholds.items():
+            values = page_df[col].to_numpy()
+            css[col] = np.where((values <= low) | (values >= high), self.colors[col], '')
+        return page_df.style.apply(lambda _: css, axis=None)
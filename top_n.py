@@ -0,0 +1,80 @@
+"""Top N customers by Recency, Frequency and Monetary in one go.
+
+Replaces three ``nsmallest``/``nlargest`` calls per rerun. For a filter
+state the three rankings are computed together, up to ``max_n`` rows each,
+with ``np.argpartition`` over the filtered values (or straight from the
+filter index's presorted order when nothing is filtered out) and cached, so
+moving only the N slider is a slice of the cached rankings.
+
+Ties are broken like ``nsmallest``/``nlargest(keep='first')``: the earlier
+row wins.
+"""
+import numpy as np
+
+from cache import LRUCache
+
+TOP_COLUMNS = ['CustomerID', 'Recency', 'Frequency', 'Monetary']
+# name -> (column, largest first)
+RANKINGS = {
+    'recent': ('Recency', False),
+    'frequent': ('Frequency', True),
+    'monetary': ('Monetary', True),
+}
+MAX_N = 50
+
+
+def _order_candidates(candidates, values, largest):
+    keys = -values[candidates] if largest else values[candidates]
+    return candidates[np.lexsort((candidates, keys))]
+
+
+def top_positions(values, positions, n, largest):
+    """Positions of the ``n`` smallest/largest ``values`` among ``positions``."""
+    subset = values[positions]
+    valid = ~np.isnan(subset) if subset.dtype.kind == 'f' else slice(None)
+    positions, subset = positions[valid], subset[valid]
+    if len(positions) > n:
+        kth = len(subset) - n if largest else n - 1
+        threshold = subset[np.argpartition(subset, kth)[kth]]
+        # Keep every row tied with the threshold so the tie-break below is exact.
+        positions = positions[subset >= threshold] if largest else positions[subset <= threshold]
+    return _order_candidates(positions, values, largest)[:n]
+
+
+def top_positions_sorted(values, order, sorted_values, n_valid, n, largest):
+    """Same as :func:`top_positions` over all rows, from a stable presorted order."""
+    n = min(n, n_valid)
+    if not n:
+        return order[:0]
+    if not largest:
+        # Stable ascending order already breaks ties by position.
+        return order[:n]
+    start = np.searchsorted(sorted_values[:n_valid], sorted_values[n_valid - n], side='left')
+    return _order_candidates(order[start:n_valid], values, largest)[:n]
+
+
+class TopN:
+    def __init__(self, df, filter_index, max_n=MAX_N, cache_size=128, cache=None):
+        self.df = df
+        self.filter_index = filter_index
+        self.max_n = max_n
+        self._values = {col: df[col].to_numpy() for col, _ in RANKINGS.values()}
+        self._cache = LRUCache(cache_size) if cache is None else cache
+
+    def rankings(self, state_key, positions, n):
+        """``{name: DataFrame}`` of the top ``n`` rows for every ranking in ``RANKINGS``."""
+        n = min(n, self.max_n)
+        ranked = self._cache.get_or_compute(state_key, self._rankings, positions)
+        return {name: df.iloc[:n] for name, df in ranked.items()}
+
+    def _rankings(self, positions):
+        unfiltered = len(positions) == self.filter_index.n_rows
+        ranked = {}
+        for name, (col, largest) in RANKINGS.items():
+            values = self._values[col]
+            if unfiltered:
+                top = top_positions_sorted(values, *self.filter_index.sorted_column(col), self.max_n, largest)
+            else:
+                top = top_positions(values, positions, self.max_n, largest)
+            ranked[name] = self.df.iloc[top][TOP_COLUMNS]
+        return ranked